@@ -1,67 +1,157 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import date, timedelta, datetime
-import time 
+import os
+import uuid
 from streamlit_gsheets import GSheetsConnection
+from armazenamento import ArmazenamentoSheets, ArmazenamentoLocal, ConflitoVersao
+from dados import normalizar_presencas, normalizar_visitantes, normalizar_membros, dict_membros
+from snapshot import SnapshotLocal
+from agregados import filtrar, montar_dados
+import paineis
+from paineis import MESES_NOMES, MESES_MAP
+from gestao import EdicaoMembros
+from escrita import FilaEscrita
+from historico import anos_arquivados, aba_destino, abas_janela, juntar_janela, arquivar_ano
+from diagnostico import Diagnostico, ArmazenamentoMedido
+from exportacao import Exportador, formatos, gerar_arquivo
 
 # --- 1. CONFIGURAÇÃO ---
 st.set_page_config(page_title="Relatorio Lucas e Rosana", layout="wide", page_icon="🛡️")
 
 URL_PLANILHA = "https://docs.google.com/spreadsheets/d/1y3vAXagtbdzaTHGEkPOuWI3TvzcfFYhfO1JUt0GrhG8/edit?usp=sharing"
-conn = st.connection("gsheets", type=GSheetsConnection)
+
+# Diagnóstico por processo: tempos de cada rerun e I/O com a planilha (RELATORIO_LOG_DIAGNOSTICO=arquivo.jsonl grava o log)
+@st.cache_resource
+def obter_diagnostico():
+    return Diagnostico(arquivo_log=os.environ.get("RELATORIO_LOG_DIAGNOSTICO"))
+
+diag = obter_diagnostico()
+execucao = st.session_state.execucao = diag.iniciar(st.session_state.setdefault("id_sessao", uuid.uuid4().hex[:8]),
+                                                    st.session_state.get("execucao"))
+
+# RELATORIO_DB_LOCAL=arquivo.sqlite roda o app sem o Google Sheets (testes locais)
+@st.cache_resource
+def obter_armazenamento():
+    if os.environ.get("RELATORIO_DB_LOCAL"):
+        return ArmazenamentoMedido(ArmazenamentoLocal(os.environ["RELATORIO_DB_LOCAL"]), obter_diagnostico())
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    return ArmazenamentoMedido(ArmazenamentoSheets(conn, URL_PLANILHA), obter_diagnostico())
+
+armazenamento = obter_armazenamento()
 
 # --- 2. FUNÇÕES DE DADOS ---
-@st.cache_data(ttl=2)
-def carregar_dados():
-    try:
-        df_p = conn.read(spreadsheet=URL_PLANILHA, worksheet="Presencas")
-        df_v = conn.read(spreadsheet=URL_PLANILHA, worksheet="Visitantes")
-        df_m = conn.read(spreadsheet=URL_PLANILHA, worksheet="Membros")
-        
-        if df_p is None or df_p.empty: df_p = pd.DataFrame(columns=['Data', 'Líder', 'Nome', 'Tipo', 'Célula', 'Culto'])
-        if df_v is None or df_v.empty: df_v = pd.DataFrame(columns=['Data', 'Líder', 'Vis_Celula', 'Vis_Culto'])
+# Snapshot único por servidor (todas as sessões): só rebaixa as abas cuja revisão mudou
+@st.cache_resource
+def obter_snapshot():
+    snap = SnapshotLocal(armazenamento, os.environ.get("RELATORIO_SNAPSHOT", ".snapshot"),
+                         {"Presencas": normalizar_presencas, "Visitantes": normalizar_visitantes, "Membros": normalizar_membros})
+    snap.ao_consultar = obter_diagnostico().somar_cache
+    return snap
 
-        def padronizar(df):
-            df['Data_Obj'] = pd.to_datetime(df['Data'], dayfirst=True, errors='coerce')
-            df['Data_Ref'] = df['Data_Obj'].dt.strftime('%Y-%m-%d')
-            df['MesNum'] = df['Data_Obj'].dt.month
-            return df
+def anos_disponiveis():
+    # Anos com dados nas abas vivas + anos arquivados + o ano corrente; e a lista dos arquivados
+    snap = obter_snapshot()
+    try:
+        vivos = {int(a) for a in snap.tabelas(["Presencas"])["Presencas"]['Ano'].unique()}
+        arquivados = anos_arquivados(snap.abas_remotas())
+    except Exception: vivos, arquivados = set(), []
+    return sorted(vivos | set(arquivados) | {datetime.now().year}), arquivados
 
-        df_p = padronizar(df_p)
-        df_v = padronizar(df_v)
-        
-        for col in ['Célula', 'Culto']: df_p[col] = pd.to_numeric(df_p[col], errors='coerce').fillna(0).astype(int)
-        for col in ['Vis_Celula', 'Vis_Culto']: df_v[col] = pd.to_numeric(df_v[col], errors='coerce').fillna(0).astype(int)
-
-        m_dict = {}
-        if df_m is not None and not df_m.empty:
-            for _, row in df_m.iterrows():
-                l = row.get('Líder')
-                if l and l not in m_dict: m_dict[l] = {}
-                if l and row.get('Nome') != "LIDER_INICIAL": m_dict[l][row['Nome']] = row.get('Tipo', 'Membro')
-        return df_p.dropna(subset=['Data_Obj']), df_v.dropna(subset=['Data_Obj']), m_dict
+def carregar_dados(ano, arquivados):
+    # Garante no snapshot as abas da janela ativa (o ano escolhido e o anterior: alertas e comparativos
+    # atravessam a virada do ano); abas de anos arquivados só são lidas quando entram na janela.
+    # A janela em si é montada uma vez por versão em carregar_agregados, sem cópia por sessão
+    try:
+        janela = [ano - 1, ano]
+        # Membros e sua revisão saem juntos: a edição em lote compara com a revisão dos dados que editou
+        t, revs = obter_snapshot().tabelas(abas_janela(janela, arquivados) + ["Membros"], revisoes=True)
+        return dict_membros(t["Membros"]), revs["Membros"], sum(len(df) for df in t.values())
     except Exception as e:
         st.error(f"Erro ao carregar: {e}")
-        return pd.DataFrame(), pd.DataFrame(), {}
+        return {}, None, 0
 
-def salvar_seguro(worksheet, df):
+def carregar_agregados(ano, arquivados):
+    # Cubo (Data_Ref x Líder), contagem de cadastrados e matriz de presença da janela do ano, junto com
+    # a versão dos dados de onde saíram: calculados uma vez por (versão, ano) e compartilhados entre sessões
     try:
-        df_save = df.copy()
-        cols_limpar = ['Data_Obj', 'Data_Ref', 'MesNum']
-        df_save = df_save.drop(columns=[c for c in cols_limpar if c in df_save.columns])
-        if 'Data' in df_save.columns: df_save['Data'] = df_save['Data'].astype(str)
-        conn.update(spreadsheet=URL_PLANILHA, worksheet=worksheet, data=df_save)
-        return True
+        snap = obter_snapshot()
+        def montar(t):
+            janela = [ano - 1, ano]
+            df_p, df_v = (juntar_janela(t, aba, janela, arquivados) for aba in ["Presencas", "Visitantes"])
+            return {"versao": (snap.versao, ano), **montar_dados(df_p, df_v, dict_membros(t["Membros"]))}
+        return snap.derivado(f"agregados_{ano}", montar)
     except Exception as e:
-        st.error(f"Erro ao salvar: {e}"); return False
+        st.error(f"Erro ao agregar: {e}")
+        return None
+
+# Painéis memoizados por (versão dos dados, filtros): só roda de novo quando algo muda
+@st.cache_data(max_entries=256, show_spinner=False)
+def _painel(versao, nome, args, _dados, _calculou):
+    _calculou.append(nome)  # só executa quando não está no cache
+    return getattr(paineis, nome)(_dados, *args)
+
+def painel(nome, *args):
+    calculou = []
+    with execucao.etapa(f"painel {nome}") as e:
+        res = _painel(st.session_state.agregados["versao"], nome, args, st.session_state.agregados, calculou)
+        if calculou: e["linhas"] = len(st.session_state.agregados["cubo"])
+    execucao.somar_cache(f"painel {nome}", "calculado" if calculou else "memória")
+    return res
+
+# Fila única por servidor: grava em segundo plano e, ao terminar, invalida só a aba gravada
+# (pedido sem aba, como o arquivamento, invalida tudo)
+@st.cache_resource
+def obter_fila():
+    snap = obter_snapshot()
+    return FilaEscrita(ao_concluir=lambda p: snap.invalidar(p.aba) if p.aba else snap.invalidar())
+
+# Relatórios OB exportados: gerados numa thread e guardados por (versão dos dados, ano, meses, formato)
+@st.cache_resource
+def obter_exportador():
+    return Exportador()
+
+def exportar_ob(ano, meses, formato):
+    dados = st.session_state.agregados
+    def gerar(avisar):
+        avisar(0.05, "Totais e chamada da rede")
+        totais, cham = paineis.relatorio_ob(dados, ano, list(meses))
+        return gerar_arquivo(totais, cham, formato, lambda f, t: avisar(0.3 + 0.7 * f, t))
+    return obter_exportador().pedir((dados["versao"], ano, meses, formato), gerar)
+
+def salvar_bloco(worksheet, df_bloco, data, lider):
+    # Grava só as linhas de (Data, Líder); pedidos repetidos do mesmo bloco ainda na fila são fundidos.
+    # Lançamento de ano já arquivado vai para a aba daquele ano, decidida na hora de gravar:
+    # um arquivamento enfileirado antes deste envio já terá criado a aba do ano
+    ano, arquivados, snap = int(data[-4:]), st.session_state.anos_arquivados, obter_snapshot()
+    def tarefa():
+        v = armazenamento.versoes()
+        destino = aba_destino(worksheet, ano, anos_arquivados(v) if v else arquivados)
+        armazenamento.upsert_bloco(destino, df_bloco, data, lider)
+        # A fila invalida a aba base; a do ano, se foi ela a gravada, fica por conta daqui
+        if destino != worksheet: snap.invalidar(destino)
+    p = obter_fila().enviar(worksheet, (data, lider), tarefa, f"{worksheet} {lider} {data}")
+    # A sessão guarda só os envios que o status mostra (um lançamento = Presencas + Visitantes)
+    st.session_state.envios = (st.session_state.get("envios", []) + [p])[-4:]
+    return p
+
+def arquivar_na_fila(ano, arquivados):
+    # Pela fila de escrita: roda depois dos upserts já enfileirados e nenhum upsert grava entre a
+    # leitura e a regravação das abas vivas. Os anos arquivados são relidos na hora de rodar
+    def tarefa():
+        v = armazenamento.versoes()
+        arquivar_ano(armazenamento, ano, anos_arquivados(v) if v else arquivados)
+    return obter_fila().enviar(None, ("arquivar", ano), tarefa, f"Arquivamento de {ano}")
 
 # --- 3. INICIALIZAÇÃO ---
-db_p, db_v, m_dict = carregar_dados()
-st.session_state.db = db_p
-st.session_state.db_visitantes = db_v
+with execucao.etapa("anos_disponiveis"): anos, arquivados = anos_disponiveis()
+ano_sel = st.sidebar.selectbox("📅 Ano:", anos[::-1], index=anos[::-1].index(datetime.now().year))
+with execucao.etapa("carregar_dados") as e:
+    m_dict, rev_membros, e["linhas"] = carregar_dados(ano_sel, arquivados)
+st.session_state.anos_arquivados = arquivados
 st.session_state.membros_cadastrados = m_dict
+st.session_state.rev_membros = rev_membros
+with execucao.etapa("carregar_agregados"): st.session_state.agregados = carregar_agregados(ano_sel, arquivados)
 
 # --- 4. ESTILO ---
 st.markdown("""<style>
@@ -73,9 +163,6 @@ st.markdown("""<style>
     .type-text { font-size: 0.75rem; color: #94A3B8; margin-bottom: 8px; }
 </style>""", unsafe_allow_html=True)
 
-MESES_NOMES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
-MESES_MAP = {n: i+1 for i, n in enumerate(MESES_NOMES)}
-
 st.title("Lucas e Rosana")
 
 # --- 5. CONTROLE DE ACESSO ---
@@ -85,10 +172,11 @@ SENHA_CORRETA = "Videira@1020"
 
 # Lógica das Abas
 if acesso_admin == SENHA_CORRETA:
-    tab_dash, tab_lanc, tab_gestao, tab_ob = st.tabs(["📊 Dados Célula e Culto", "📝 Preencher Relatorio Lider", "⚙️ GESTÃO Células", "📋 RELATÓRIO OB e Chamada"])
+    # on_change="rerun": só a aba aberta executa (as outras ficam com .open == False)
+    tab_dash, tab_lanc, tab_gestao, tab_ob = st.tabs(["📊 Dados Célula e Culto", "📝 Preencher Relatorio Lider", "⚙️ GESTÃO Células", "📋 RELATÓRIO OB e Chamada"], key="aba_ativa", on_change="rerun")
 else:
-    # Se não tem senha, cria apenas uma aba (o retorno de st.tabs é uma lista)
-    tab_lanc = st.tabs(["📝 Preencher Relatorio Lider"])[0]
+    # Se não tem senha, cria apenas uma aba (o retorno de st.tabs é uma lista); on_change="rerun" para .open valer True
+    tab_lanc = st.tabs(["📝 Preencher Relatorio Lider"], key="aba_lider", on_change="rerun")[0]
     tab_dash, tab_gestao, tab_ob = None, None, None
     if acesso_admin != "":
         st.sidebar.error("Senha incorreta!")
@@ -96,253 +184,250 @@ else:
 # --- CONTEÚDO DAS ABAS ---
 
 # --- ABA DASHBOARD ---
-if tab_dash:
+if tab_dash and tab_dash.open:
     with tab_dash:
-        if st.button("🔄 Sincronizar"): st.cache_data.clear(); st.rerun()
-        if not st.session_state.db.empty:
+        if st.button("🔄 Sincronizar"): obter_snapshot().invalidar(); st.rerun()
+        if st.session_state.agregados and st.session_state.agregados["matriz"].datas:
             lids_atuais = sorted(list(st.session_state.membros_cadastrados.keys()))
             lids_f = st.multiselect("Filtrar Células:", lids_atuais, default=lids_atuais)
-            datas_u = sorted(st.session_state.db['Data_Ref'].unique(), reverse=True)
-            if len(datas_u) >= 2:
+            n_al = st.number_input("Janela de Alerta (semanas):", 2, 8, 2)
+            msgs = painel("alertas", lids_f, n_al)
+            if msgs is not None:
                 st.subheader("⚠️ Alertas de Frequência")
-                d1, d2 = datas_u[0], datas_u[1]
-                for lid in lids_f:
-                    v1 = st.session_state.db_visitantes[(st.session_state.db_visitantes['Data_Ref']==d1)&(st.session_state.db_visitantes['Líder']==lid)]['Vis_Celula'].sum()
-                    v2 = st.session_state.db_visitantes[(st.session_state.db_visitantes['Data_Ref']==d2)&(st.session_state.db_visitantes['Líder']==lid)]['Vis_Celula'].sum()
-                    if v1 == 0 and v2 == 0: st.error(f"🚩 **{lid}**: Sem visitantes nas últimas 2 semanas.")
-                    for n, t in st.session_state.membros_cadastrados.get(lid, {}).items():
-                        p1 = st.session_state.db[(st.session_state.db['Data_Ref']==d1)&(st.session_state.db['Líder']==lid)&(st.session_state.db['Nome']==n)]['Célula'].sum()
-                        p2 = st.session_state.db[(st.session_state.db['Data_Ref']==d2)&(st.session_state.db['Líder']==lid)&(st.session_state.db['Nome']==n)]['Célula'].sum()
-                        if p1 == 0 and p2 == 0: st.error(f"👤 **{n}** ({lid}): Ausente nas últimas 2 reuniões.")
+                for msg in msgs: st.error(msg)
             st.divider()
             m_s = st.selectbox("Mês de Análise:", MESES_NOMES, index=datetime.now().month-1)
-            df_m = st.session_state.db[st.session_state.db['MesNum']==MESES_MAP[m_s]]
-            if not df_m.empty:
-                d_m = sorted(df_m['Data_Ref'].unique(), reverse=True)
-                s_r = st.selectbox("Semana Selecionada:", d_m, format_func=lambda x: datetime.strptime(x, '%Y-%m-%d').strftime('%d/%m/%Y'))
-                df_s = df_m[(df_m['Data_Ref']==s_r) & (df_m['Líder'].isin(lids_f))]
-                dv_s = st.session_state.db_visitantes[(st.session_state.db_visitantes['Data_Ref']==s_r) & (st.session_state.db_visitantes['Líder'].isin(lids_f))]
-                c1, c2, c3, c4, c5, c6 = st.columns(6)
-                def get_card_val(tipo, modo):
-                    if tipo == "M":
-                        total = sum([1 for l in lids_f for n, t in st.session_state.membros_cadastrados.get(l, {}).items() if t == "Membro"]) + len(lids_f)
-                        pres = int(df_s[df_s['Tipo'].isin(['Membro', 'Liderança'])][modo].sum())
-                        return f"{pres}/{total}"
-                    elif tipo == "FA":
-                        total = sum([1 for l in lids_f for n, t in st.session_state.membros_cadastrados.get(l, {}).items() if t == "FA"])
-                        pres = int(df_s[df_s['Tipo'] == "FA"][modo].sum())
-                        return f"{pres}/{total}"
-                    else: return str(int(dv_s['Vis_Celula' if modo == 'Célula' else 'Vis_Culto'].sum()) if not dv_s.empty else 0)
-                c1.markdown(f'<div class="metric-box">Mem. Célula<br><span class="metric-value">{get_card_val("M","Célula")}</span></div>', unsafe_allow_html=True)
-                c2.markdown(f'<div class="metric-box">FA Célula<br><span class="metric-value">{get_card_val("FA","Célula")}</span></div>', unsafe_allow_html=True)
-                c3.markdown(f'<div class="metric-box">Vis. Célula<br><span class="metric-value">{get_card_val("V","Célula")}</span></div>', unsafe_allow_html=True)
-                c4.markdown(f'<div class="metric-box">Mem. Culto<br><span class="metric-value">{get_card_val("M","Culto")}</span></div>', unsafe_allow_html=True)
-                c5.markdown(f'<div class="metric-box">FA Culto<br><span class="metric-value">{get_card_val("FA","Culto")}</span></div>', unsafe_allow_html=True)
-                c6.markdown(f'<div class="metric-box">Vis. Culto<br><span class="metric-value">{get_card_val("V","Culto")}</span></div>', unsafe_allow_html=True)
+            d_m = painel("semanas", ano_sel, MESES_MAP[m_s])[::-1]
+            if d_m:
+                s_r = st.selectbox("Semana Selecionada:", d_m, format_func=lambda x: x.strftime('%d/%m/%Y'))
+                for c, (rot, val) in zip(st.columns(6), painel("cards", lids_f, ano_sel, MESES_MAP[m_s], s_r)):
+                    c.markdown(f'<div class="metric-box">{rot}<br><span class="metric-value">{val}</span></div>', unsafe_allow_html=True)
                 
                 cg1, cg2 = st.columns(2)
                 for col, modo, k, tit in zip([cg1, cg2], ['Célula', 'Culto'], ['chart_cel', 'chart_cul'], ["evolução semanal celula", "evolução semanal culto"]):
                     col.write(f"### 📈 {tit}")
-                    g_d = df_m[df_m['Líder'].isin(lids_f)].groupby('Data_Ref')[modo].sum().reset_index()
-                    g_v = st.session_state.db_visitantes[(st.session_state.db_visitantes['MesNum']==MESES_MAP[m_s])&(st.session_state.db_visitantes['Líder'].isin(lids_f))].groupby('Data_Ref')['Vis_Celula' if modo=='Célula' else 'Vis_Culto'].sum().reset_index()
-                    mrg = pd.merge(g_d, g_v, on='Data_Ref', how='outer').fillna(0).sort_values('Data_Ref')
-                    mrg['D'] = mrg['Data_Ref'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d').strftime('%d/%m'))
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(x=mrg['D'], y=mrg[modo], name='Membros+FA', mode='lines+markers+text', text=mrg[modo], textposition="top center"))
-                    fig.add_trace(go.Scatter(x=mrg['D'], y=mrg.iloc[:,2], name='Visitantes', mode='lines+markers+text', text=mrg.iloc[:,2], textposition="bottom center"))
-                    fig.update_layout(height=300, margin=dict(l=0,r=0,t=30,b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-                    col.plotly_chart(fig, use_container_width=True, key=k)
+                    fig = painel("figura_evolucao", lids_f, ano_sel, MESES_MAP[m_s], modo)
+                    with execucao.etapa("plotly (render)"): col.plotly_chart(fig, use_container_width=True, key=k)
 
                 st.divider()
-                st.subheader(f"📊 Performance: {m_s} e Meses Anteriores")
-                idx_analise = MESES_MAP[m_s]
-                indices_comparar = [idx_analise - 2, idx_analise - 1, idx_analise]
-                dados_comp = []
-                for idx in indices_comparar:
-                    if idx > 0:
-                        nome_m = MESES_NOMES[idx-1]
-                        d_mes = st.session_state.db[(st.session_state.db['MesNum']==idx) & (st.session_state.db['Líder'].isin(lids_f))]
-                        v_mes = st.session_state.db_visitantes[(st.session_state.db_visitantes['MesNum']==idx) & (st.session_state.db_visitantes['Líder'].isin(lids_f))]
-                        val_fa = int(d_mes[d_mes['Tipo']=="FA"]['Célula'].sum())
-                        val_mem = int(d_mes[d_mes['Tipo'].isin(['Membro','Liderança'])]['Célula'].sum())
-                        val_vis = int(v_mes['Vis_Celula'].sum())
-                        dados_comp.append({"Mês": nome_m, "Métrica": "Membro + FA", "Valor": val_mem + val_fa})
-                        dados_comp.append({"Mês": nome_m, "Métrica": "Visitante", "Valor": val_vis})
-                        dados_comp.append({"Mês": nome_m, "Métrica": "Total Geral", "Valor": val_mem + val_fa + val_vis})
-                if dados_comp:
-                    df_barras = pd.DataFrame(dados_comp)
-                    fig_bar = px.bar(df_barras, x="Mês", y="Valor", color="Métrica", barmode="group", text_auto=True, 
-                                     color_discrete_map={"Membro + FA": "#38BDF8", "Visitante": "#0284C7", "Total Geral": "#F8FAFC"}, height=400)
-                    fig_bar.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color="#F8FAFC", 
-                                         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5))
-                    st.plotly_chart(fig_bar, use_container_width=True)
+                st.subheader(f"📊 Performance: {m_s}/{ano_sel} e Meses Anteriores")
+                fig_bar = painel("figura_performance", lids_f, ano_sel, MESES_MAP[m_s])
+                if fig_bar is not None:
+                    with execucao.etapa("plotly (render)"): st.plotly_chart(fig_bar, use_container_width=True)
 
 # --- ABA LANÇAR ---
-with tab_lanc:
-    if st.session_state.membros_cadastrados:
-        l_m = st.selectbox("Mês Lançar", MESES_NOMES, index=datetime.now().month-1)
-        col_data, col_cel = st.columns(2)
-        with col_data:
-            datas_s = [date(2026, MESES_MAP[l_m], d) for d in range(1, 32) if (date(2026, MESES_MAP[l_m], 1) + timedelta(days=d-1)).month == MESES_MAP[l_m] and (date(2026, MESES_MAP[l_m], 1) + timedelta(days=d-1)).weekday() == 5]
-            d_l = st.selectbox("Sábado", datas_s, format_func=lambda x: x.strftime('%d/%m'))
-        with col_cel:
-            l_l = st.selectbox("Sua Célula", sorted(st.session_state.membros_cadastrados.keys()))
+if tab_lanc.open:
+    with tab_lanc:
+        if st.session_state.membros_cadastrados:
+            l_m = st.selectbox("Mês Lançar", MESES_NOMES, index=datetime.now().month-1)
+            col_data, col_cel = st.columns(2)
+            with col_data:
+                datas_s = [date(ano_sel, MESES_MAP[l_m], d) for d in range(1, 32) if (date(ano_sel, MESES_MAP[l_m], 1) + timedelta(days=d-1)).month == MESES_MAP[l_m] and (date(ano_sel, MESES_MAP[l_m], 1) + timedelta(days=d-1)).weekday() == 5]
+                d_l = st.selectbox("Sábado", datas_s, format_func=lambda x: x.strftime('%d/%m'))
+            with col_cel:
+                l_l = st.selectbox("Sua Célula", sorted(st.session_state.membros_cadastrados.keys()))
         
-        st.divider()
-        if "presencas_bt" not in st.session_state: st.session_state.presencas_bt = {}
-
-        def criar_linha_mobile(nome, tipo):
-            k_cel = f"bt_cel_{nome}"
-            k_cul = f"bt_cul_{nome}"
-            if k_cel not in st.session_state.presencas_bt: st.session_state.presencas_bt[k_cel] = (tipo == "Liderança")
-            if k_cul not in st.session_state.presencas_bt: st.session_state.presencas_bt[k_cul] = (tipo == "Liderança")
-
-            st.markdown(f'''<div class="mobile-row">
-                <div class="name-text">{nome}</div>
-                <div class="type-text">({tipo})</div>
-            </div>''', unsafe_allow_html=True)
-            
-            b1, b2, b3, b4 = st.columns([1, 2, 2, 1])
-            label_cel = "Célula 🏠 ✅" if st.session_state.presencas_bt[k_cel] else "Célula 🏠 ❌"
-            if b2.button(label_cel, key=f"btn_{k_cel}", use_container_width=True):
-                st.session_state.presencas_bt[k_cel] = not st.session_state.presencas_bt[k_cel]
-                st.rerun()
-
-            label_cul = "Culto ⛪ ✅" if st.session_state.presencas_bt[k_cul] else "Culto ⛪ ❌"
-            if b3.button(label_cul, key=f"btn_{k_cul}", use_container_width=True):
-                st.session_state.presencas_bt[k_cul] = not st.session_state.presencas_bt[k_cul]
-                st.rerun()
-            st.markdown("---")
-
-        criar_linha_mobile(l_l, "Liderança")
-        for n, t in st.session_state.membros_cadastrados.get(l_l, {}).items():
-            criar_linha_mobile(n, t)
+            st.divider()
+            # Lançamento já salvo para este Sábado/Célula: o formulário abre preenchido para edição
+            ts_l = pd.Timestamp(d_l)
+            agr = st.session_state.agregados
+            salvo = filtrar(agr["cubo"], lideres=[l_l], data=ts_l) if agr else pd.DataFrame()
+            ja_lancado = not salvo.empty and salvo['Linhas'].iloc[0] > 0
+            pres_salva = agr["matriz"].registro(l_l, ts_l) if ja_lancado else {}
+            if ja_lancado: st.info("📌 Relatório deste sábado já lançado: editando os valores salvos.")
 
-        st.divider()
-        st.subheader("✨ Visitantes")
-        col_v1, col_v2 = st.columns(2)
-        vce = col_v1.number_input("🏠 Vis. Célula", 0)
-        vcu = col_v2.number_input("⛪ Vis. Culto", 0)
-        
-        if st.button("💾 SALVAR LANÇAMENTO", use_container_width=True, type="primary"):
-            novos = []
-            novos.append({
-                "Data": d_l.strftime('%d/%m/%Y'), "Líder": l_l, "Nome": l_l, "Tipo": "Liderança", 
-                "Célula": 1 if st.session_state.presencas_bt[f"bt_cel_{l_l}"] else 0, 
-                "Culto": 1 if st.session_state.presencas_bt[f"bt_cul_{l_l}"] else 0
-            })
-            for n, t in st.session_state.membros_cadastrados.get(l_l, {}).items():
-                novos.append({
-                    "Data": d_l.strftime('%d/%m/%Y'), "Líder": l_l, "Nome": n, "Tipo": t, 
-                    "Célula": 1 if st.session_state.presencas_bt[f"bt_cel_{n}"] else 0, 
-                    "Culto": 1 if st.session_state.presencas_bt[f"bt_cul_{n}"] else 0
-                })
+            def criar_linha_mobile(nome, tipo):
+                # Toggles dentro do form: nada vai ao servidor até o SALVAR
+                padrao = (False, False) if ja_lancado else (tipo == "Liderança",) * 2
+                cel, cul = pres_salva.get(nome, padrao)
+                st.markdown(f'''<div class="mobile-row">
+                    <div class="name-text">{nome}</div>
+                    <div class="type-text">({tipo})</div>
+                </div>''', unsafe_allow_html=True)
+                b1, b2, b3, b4 = st.columns([1, 2, 2, 1])
+                v_cel = b2.toggle("Célula 🏠", value=cel, key=f"cel_{l_l}_{d_l}_{nome}")
+                v_cul = b3.toggle("Culto ⛪", value=cul, key=f"cul_{l_l}_{d_l}_{nome}")
+                st.markdown("---")
+                return v_cel, v_cul
+
+            pessoas = [(l_l, "Liderança")] + list(st.session_state.membros_cadastrados.get(l_l, {}).items())
+            with st.form(f"form_lanc_{l_l}_{d_l}", border=False):
+                marcados = [(n, t) + criar_linha_mobile(n, t) for n, t in pessoas]
+
+                st.divider()
+                st.subheader("✨ Visitantes")
+                col_v1, col_v2 = st.columns(2)
+                vce = col_v1.number_input("🏠 Vis. Célula", 0, value=int(salvo['Vis_Celula'].iloc[0]) if ja_lancado else 0, key=f"vce_{l_l}_{d_l}")
+                vcu = col_v2.number_input("⛪ Vis. Culto", 0, value=int(salvo['Vis_Culto'].iloc[0]) if ja_lancado else 0, key=f"vcu_{l_l}_{d_l}")
+                enviar = st.form_submit_button("💾 SALVAR LANÇAMENTO", use_container_width=True, type="primary")
+
+            if enviar:
+                novos = [{"Data": d_l.strftime('%d/%m/%Y'), "Líder": l_l, "Nome": n, "Tipo": t, "Célula": int(ce), "Culto": int(cu)}
+                         for n, t, ce, cu in marcados]
             
-            dt_ref = d_l.strftime('%d/%m/%Y')
-            dfp = pd.concat([st.session_state.db[~((st.session_state.db['Data']==dt_ref)&(st.session_state.db['Líder']==l_l))], pd.DataFrame(novos)])
-            dfv = pd.concat([st.session_state.db_visitantes[~((st.session_state.db_visitantes['Data']==dt_ref)&(st.session_state.db_visitantes['Líder']==l_l))], pd.DataFrame([{"Data": dt_ref, "Líder": l_l, "Vis_Celula": vce, "Vis_Culto": vcu}])])
+                dt_ref = d_l.strftime('%d/%m/%Y')
+                dfp = pd.DataFrame(novos)
+                dfv = pd.DataFrame([{"Data": dt_ref, "Líder": l_l, "Vis_Celula": vce, "Vis_Culto": vcu}])
             
-            if salvar_seguro("Presencas", dfp) and salvar_seguro("Visitantes", dfv): 
-                st.success("Salvo com sucesso!")
-                st.session_state.presencas_bt = {} 
-                time.sleep(1)
-                st.cache_data.clear(); st.rerun()
+                # Enfileira e volta na hora; o status abaixo acompanha a gravação
+                with execucao.etapa("salvar (enfileirar)", len(dfp) + len(dfv)):
+                    salvar_bloco("Presencas", dfp, dt_ref, l_l); salvar_bloco("Visitantes", dfv, dt_ref, l_l)
+
+            envios = st.session_state.get("envios", [])
+            if envios:
+                em_andamento = any(not p.concluido for p in envios)
+                @st.fragment(run_every=2 if em_andamento else None)
+                def status_envios():
+                    for p in envios:
+                        if p.status == "gravado": st.success(f"✅ Salvo: {p.descricao}")
+                        elif p.status == "substituído": st.success(f"✅ Substituído por envio mais recente: {p.descricao}")
+                        elif p.status == "erro": st.error(f"Erro ao salvar {p.descricao}: {p.erro}")
+                        else: st.info(f"⏳ {p.status.capitalize()}{f' (tentativa {p.tentativas})' if p.tentativas > 1 else ''}: {p.descricao}")
+                    # Terminou tudo: um rerun completo para mostrar os dados já gravados
+                    if em_andamento and all(p.concluido for p in envios): st.rerun()
+                status_envios()
 
 # --- ABA GESTÃO ---
-if tab_gestao:
+if tab_gestao and tab_gestao.open:
     with tab_gestao:
-        def sync_membros():
-            lista = []
-            for ld, ps in st.session_state.membros_cadastrados.items():
-                if not ps: lista.append({"Líder":ld,"Nome":"LIDER_INICIAL","Tipo":"Liderança"})
-                else: [lista.append({"Líder":ld,"Nome":n,"Tipo":t}) for n,t in ps.items()]
-            salvar_seguro("Membros", pd.DataFrame(lista))
+        # Edição em lote: as ações só mudam `ed.atual`; a planilha é gravada uma vez em "Confirmar"
+        rev_membros = st.session_state.rev_membros
+        ed = st.session_state.get("edicao_membros")
+        if ed is None or (not ed.operacoes and ed.versao != rev_membros):
+            ed = st.session_state.edicao_membros = EdicaoMembros(st.session_state.membros_cadastrados, rev_membros)
+        if ed.operacoes:
+            st.subheader(f"📝 Alterações Pendentes ({len(ed.operacoes)})")
+            st.dataframe(ed.diferencas(), use_container_width=True, hide_index=True)
+            with st.expander("Ações na ordem"):
+                for op in ed.operacoes: st.write(f"• {op}")
+            c_ok, c_desf = st.columns(2)
+            if c_ok.button("💾 Confirmar Alterações", type="primary", use_container_width=True):
+                try:
+                    ed.confirmar(armazenamento)
+                    del st.session_state.edicao_membros
+                    obter_snapshot().invalidar("Membros"); st.rerun()
+                except ConflitoVersao:
+                    st.error("Outro administrador alterou as células enquanto você editava. Descarte e refaça sobre a versão atual.")
+                except Exception as e:
+                    st.error(f"Erro ao salvar: {e}")
+            if c_desf.button("↩️ Descartar Alterações", use_container_width=True):
+                del st.session_state.edicao_membros
+                obter_snapshot().invalidar("Membros"); st.rerun()
+            st.divider()
         st.subheader("➕ Adicionar Novo")
         c_add1, c_add2 = st.columns(2)
         with c_add1:
             nl = st.text_input("Novo Líder Externo")
             if st.button("Criar Célula"):
-                if nl and nl not in st.session_state.membros_cadastrados:
-                    st.session_state.membros_cadastrados[nl] = {}; sync_membros(); st.rerun()
+                if ed.criar_celula(nl): st.rerun()
         with c_add2:
-            if st.session_state.membros_cadastrados:
-                cs = st.selectbox("Célula para Membro:", sorted(st.session_state.membros_cadastrados.keys()))
+            if ed.atual:
+                cs = st.selectbox("Célula para Membro:", sorted(ed.atual.keys()))
                 nm = st.text_input("Nome da Pessoa")
                 tm = st.radio("Tipo Inicial", ["Membro", "FA"], horizontal=True)
                 if st.button("Adicionar Pessoa"):
-                    if nm: st.session_state.membros_cadastrados[cs][nm]=tm; sync_membros(); st.rerun()
+                    if ed.adicionar(cs, nm, tm): st.rerun()
         st.divider()
         st.subheader("🚀 Multiplicação e Transferência")
-        if st.session_state.membros_cadastrados:
-            cel_origem = st.selectbox("Célula de Origem:", sorted(st.session_state.membros_cadastrados.keys()), key="orig")
-            membros_orig = list(st.session_state.membros_cadastrados[cel_origem].keys())
+        if ed.atual:
+            cel_origem = st.selectbox("Célula de Origem:", sorted(ed.atual.keys()), key="orig")
+            membros_orig = list(ed.atual[cel_origem].keys())
             if membros_orig:
                 membro_transf = st.selectbox("Selecionar Pessoa para Mover/Promover:", membros_orig)
-                tipo_membro = st.session_state.membros_cadastrados[cel_origem][membro_transf]
                 col_t1, col_t2 = st.columns(2)
                 with col_t1:
                     if st.button(f"🌟 Tornar Líder (Nova Célula: {membro_transf})"):
-                        del st.session_state.membros_cadastrados[cel_origem][membro_transf]
-                        st.session_state.membros_cadastrados[membro_transf] = {}
-                        sync_membros(); st.rerun()
+                        ed.promover(cel_origem, membro_transf); st.rerun()
                 with col_t2:
-                    cel_dest = [c for c in st.session_state.membros_cadastrados.keys() if c != cel_origem]
+                    cel_dest = [c for c in ed.atual.keys() if c != cel_origem]
                     if cel_dest:
                         cel_destino = st.selectbox("Transferir para Célula Existente:", cel_dest)
                         if st.button("Confirmar Transferência"):
-                            st.session_state.membros_cadastrados[cel_destino][membro_transf] = tipo_membro
-                            del st.session_state.membros_cadastrados[cel_origem][membro_transf]
-                            sync_membros(); st.rerun()
+                            ed.transferir(cel_origem, cel_destino, membro_transf); st.rerun()
         st.divider()
         st.subheader("🗑️ Gerenciar e Excluir")
-        if st.session_state.membros_cadastrados:
-            cel_edit = st.selectbox("Selecione para Editar/Excluir:", sorted(st.session_state.membros_cadastrados.keys()))
+        if ed.atual:
+            cel_edit = st.selectbox("Selecione para Editar/Excluir:", sorted(ed.atual.keys()))
             if st.button(f"Excluir Célula de {cel_edit}"):
-                del st.session_state.membros_cadastrados[cel_edit]; sync_membros(); st.rerun()
-            membros_da_cel = st.session_state.membros_cadastrados.get(cel_edit, {})
+                ed.excluir_celula(cel_edit); st.rerun()
+            membros_da_cel = ed.atual.get(cel_edit, {})
             for nome, tipo in list(membros_da_cel.items()):
                 c_n, c_t, c_b1, c_b2 = st.columns([3, 2, 3, 2])
                 c_n.write(nome); c_t.write(f"({tipo})")
                 novo_t = "FA" if tipo == "Membro" else "Membro"
                 if c_b1.button(f"Mudar para {novo_t}", key=f"t_{nome}"):
-                    st.session_state.membros_cadastrados[cel_edit][nome] = novo_t; sync_membros(); st.rerun()
+                    ed.alternar_tipo(cel_edit, nome); st.rerun()
                 if c_b2.button("❌", key=f"x_{nome}"):
-                    del st.session_state.membros_cadastrados[cel_edit][nome]; sync_membros(); st.rerun()
+                    ed.excluir_pessoa(cel_edit, nome); st.rerun()
+        st.divider()
+        st.subheader("🗄️ Arquivar Histórico")
+        # Tira um ano fechado das abas vivas para 'Presencas_<ano>'/'Visitantes_<ano>': as vivas ficam leves
+        # e o ano arquivado só é lido quando escolhido no seletor de ano
+        anos_fechados = [int(a) for a in sorted(obter_snapshot().tabelas(["Presencas"])["Presencas"]['Ano'].unique()) if a < datetime.now().year]
+        if anos_fechados:
+            ano_arq = st.selectbox("Ano para arquivar:", anos_fechados)
+            if st.button(f"Arquivar {ano_arq}"): st.session_state.arquivamento = arquivar_na_fila(ano_arq, arquivados)
+        else: st.caption("Nenhum ano fechado nas abas vivas.")
+        p_arq = st.session_state.get("arquivamento")
+        if p_arq:
+            arquivando = not p_arq.concluido
+            @st.fragment(run_every=2 if arquivando else None)
+            def status_arquivamento():
+                if p_arq.status == "gravado": st.success(f"✅ {p_arq.descricao} concluído.")
+                elif p_arq.status == "erro": st.error(f"Erro ao arquivar: {p_arq.erro}")
+                else: st.info(f"⏳ {p_arq.descricao}: {p_arq.status}")
+                if arquivando and p_arq.concluido: st.rerun()
+            status_arquivamento()
 
 # --- ABA RELATÓRIO OB ---
-if tab_ob:
+if tab_ob and tab_ob.open:
     with tab_ob:
         st.header("📋 Relatório OB")
         m_ob = st.selectbox("Mês OB:", MESES_NOMES, index=datetime.now().month-1, key="ob_m_final")
-        df_ob = st.session_state.db[st.session_state.db['MesNum'] == MESES_MAP[m_ob]]
-        df_v_ob = st.session_state.db_visitantes[st.session_state.db_visitantes['MesNum'] == MESES_MAP[m_ob]]
-        if not df_ob.empty:
+        res_sem = painel("totais_semanais", ano_sel, MESES_MAP[m_ob])
+        if not res_sem.empty:
             st.subheader("📊 Totais Semanais da Rede")
-            res_sem = []
-            for d_r in sorted(df_ob['Data_Ref'].unique()):
-                d_f = datetime.strptime(d_r, '%Y-%m-%d').strftime('%d/%m')
-                df_s = df_ob[df_ob['Data_Ref'] == d_r]
-                m_ce = df_s[df_s['Tipo'].isin(['Membro','Liderança'])]['Célula'].sum()
-                m_cu = df_s[df_s['Tipo'].isin(['Membro','Liderança'])]['Culto'].sum()
-                f_ce, f_cu = df_s[df_s['Tipo']=="FA"]['Célula'].sum(), df_s[df_s['Tipo']=="FA"]['Culto'].sum()
-                v_ce, v_cu = df_v_ob[df_v_ob['Data_Ref']==d_r]['Vis_Celula'].sum(), df_v_ob[df_v_ob['Data_Ref']==d_r]['Vis_Culto'].sum()
-                res_sem.append({"Data": d_f, "Membros": f"{m_ce}/{m_cu}", "FA": f"{f_ce}/{f_cu}", "Vis": f"{v_ce}/{v_cu}", "Total": f"{m_ce+f_ce+v_ce}/{m_cu+f_cu+v_cu}"})
-            st.table(pd.DataFrame(res_sem))
+            st.table(res_sem)
             st.divider(); st.subheader("🕵️ Chamada Detalhada (Célula | Culto)")
             cel_sel_ob = st.selectbox("Selecionar Célula:", sorted(st.session_state.membros_cadastrados.keys()), key="ob_c_final")
-            m_cel = [{"Nome": cel_sel_ob, "Tipo": "Liderança"}] + [{"Nome": n, "Tipo": t} for n, t in st.session_state.membros_cadastrados.get(cel_sel_ob, {}).items()]
-            d_mes = sorted(df_ob['Data_Ref'].unique()); cham_d = []
-            for p in m_cel:
-                ln = {"Pessoa": f"{p['Nome']} ({p['Tipo']})"}
-                for d in d_mes:
-                    df_c = df_ob[(df_ob['Data_Ref']==d)&(df_ob['Nome']==p['Nome'])&(df_ob['Líder']==cel_sel_ob)]
-                    if not df_c.empty:
-                        p_ce = "✅" if df_c['Célula'].sum() > 0 else "❌"
-                        p_cu = "✅" if df_c['Culto'].sum() > 0 else "❌"
-                        ln[datetime.strptime(d, '%Y-%m-%d').strftime('%d/%m')] = f"{p_ce} | {p_cu}"
-                    else: ln[datetime.strptime(d, '%Y-%m-%d').strftime('%d/%m')] = "❌ | ❌"
-                cham_d.append(ln)
-            st.dataframe(pd.DataFrame(cham_d), use_container_width=True, hide_index=True)
-
+            st.dataframe(painel("chamada", cel_sel_ob, ano_sel, MESES_MAP[m_ob]), use_container_width=True, hide_index=True)
 
+        st.divider(); st.subheader("📦 Exportar Relatório Completo (todas as células)")
+        c_ini, c_fim, c_fmt = st.columns(3)
+        m_ini = c_ini.selectbox("De:", MESES_NOMES, index=MESES_MAP[m_ob]-1)
+        m_fim = c_fim.selectbox("Até:", MESES_NOMES, index=MESES_MAP[m_ob]-1)
+        fmt = c_fmt.radio("Formato:", formatos(), horizontal=True, key="exp_fmt")
+        meses_exp = tuple(range(MESES_MAP[m_ini], MESES_MAP[m_fim] + 1))
+        if not meses_exp: st.warning("O mês final é anterior ao inicial.")
+        elif st.button("⚙️ Gerar Relatório"):
+            st.session_state.exportacao = (ano_sel, meses_exp, fmt, exportar_ob(ano_sel, meses_exp, fmt))
+        if st.session_state.get("exportacao"):
+            a_exp, m_exp, f_exp, tarefa = st.session_state.exportacao
+            gerando = not tarefa.concluida
+            @st.fragment(run_every=1 if gerando else None)
+            def status_exportacao():
+                if tarefa.status == "erro": st.error(f"Erro ao gerar o relatório: {tarefa.erro}")
+                elif tarefa.status == "pronto":
+                    nome = f"relatorio_ob_{a_exp}_{m_exp[0]:02d}-{m_exp[-1]:02d}.{'xlsx' if f_exp == 'XLSX' else 'zip'}"
+                    st.download_button(f"⬇️ Baixar {nome}", tarefa.resultado, nome, on_click="ignore", type="primary")
+                else: st.progress(tarefa.progresso, text=f"⏳ Gerando: {tarefa.texto}")
+                if gerando and tarefa.concluida: st.rerun()
+            status_exportacao()
 
+# --- DIAGNÓSTICO (ADMIN) ---
+diag.concluir(execucao)
+if acesso_admin == SENHA_CORRETA:
+    with st.expander("🩺 Diagnóstico de Desempenho"):
+        st.caption(f"Este rerun: {execucao.duracao:.0f} ms. Gravações da fila rodam em segundo plano e só entram nos totais do processo.")
+        etapas, io, cache = execucao.tabelas()
+        c_et, c_io = st.columns(2)
+        c_et.dataframe(etapas, hide_index=True, use_container_width=True)
+        if io.empty: c_io.caption("Nenhuma chamada ao armazenamento neste rerun (tudo veio do snapshot).")
+        else: c_io.dataframe(io, hide_index=True, use_container_width=True)
+        if not cache.empty:
+            st.dataframe(cache.pivot_table(index="Nome", columns="Origem", values="Vezes", aggfunc="sum", fill_value=0), use_container_width=True)
+        st.divider()
+        lat, io_total = diag.resumo()
+        for c, (rot, val) in zip(st.columns(len(lat) or 1), lat.items()): c.metric(rot, f"{val:.0f}")
+        st.dataframe(io_total, hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Exportar log (JSONL)", diag.exportar, "diagnostico.jsonl", "application/json", on_click="ignore")
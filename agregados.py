@@ -0,0 +1,95 @@
+import pandas as pd
+
+# --- CUBO DE FREQUÊNCIA ---
+# Uma linha por (Data_Ref, Líder) com as somas já separadas por grupo de Tipo.
+# Montado uma vez por carga de dados; cards, gráficos e totais do OB leem daqui
+# em vez de varrer as tabelas brutas a cada widget.
+
+GRUPOS = {"Membro": "M", "Liderança": "M", "FA": "FA"}  # qualquer outro Tipo cai em "Outro"
+MEDIDAS = ['M_Célula', 'M_Culto', 'FA_Célula', 'FA_Culto', 'Outro_Célula', 'Outro_Culto', 'Vis_Celula', 'Vis_Culto', 'Linhas']
+
+def montar_cubo(df_p, df_v):
+    chave = ['Data_Ref', 'Líder']
+    grupo = df_p['Tipo'].astype(str).map(GRUPOS).fillna("Outro")
+    pres = df_p.assign(Grupo=grupo).groupby(chave + ['Grupo'], observed=True)[['Célula', 'Culto']].sum().unstack('Grupo', fill_value=0)
+    pres.columns = [f"{g}_{m}" for m, g in pres.columns]
+    pres['Linhas'] = df_p.groupby(chave, observed=True).size()
+    vis = df_v.groupby(chave, observed=True)[['Vis_Celula', 'Vis_Culto']].sum()
+    cubo = pres.join(vis, how='outer').reindex(columns=MEDIDAS).fillna(0).astype(int).reset_index()
+    cubo['Líder'] = cubo['Líder'].astype('category')
+    cubo['Ano'] = cubo['Data_Ref'].dt.year.astype('int16')
+    cubo['MesNum'] = cubo['Data_Ref'].dt.month.astype('int8')
+    return cubo
+
+def contar_membros(m_dict):
+    # Líder -> quantidade de 'Membro' e de 'FA' cadastrados
+    linhas = [(l, t) for l, ps in m_dict.items() for t in ps.values()]
+    cont = pd.DataFrame(linhas, columns=['Líder', 'Tipo']).value_counts().unstack('Tipo', fill_value=0)
+    return cont.reindex(index=list(m_dict), columns=['Membro', 'FA'], fill_value=0)
+
+def filtrar(cubo, lideres=None, ano=None, mes=None, data=None, datas=None):
+    m = pd.Series(True, index=cubo.index)
+    if lideres is not None: m &= cubo['Líder'].isin(lideres)
+    if ano is not None: m &= cubo['Ano'] == ano
+    if mes is not None: m &= cubo['MesNum'] == mes
+    if data is not None: m &= cubo['Data_Ref'] == data
+    if datas is not None: m &= cubo['Data_Ref'].isin(datas)
+    return cubo[m]
+
+def por_semana(cubo):
+    # Soma por Data_Ref, só com as semanas que têm chamada lançada
+    sem = cubo.groupby('Data_Ref', observed=True)[MEDIDAS].sum()
+    return sem[sem['Linhas'] > 0]
+
+
+# --- MATRIZ PESSOA x SEMANA ---
+# Presença (1/0, int8) por (Líder, Nome) x Data_Ref, um plano para Célula e outro para Culto.
+# Sem linha lançada conta como ausente, igual à chamada e aos alertas.
+
+class MatrizPresenca:
+    def __init__(self, df_p):
+        pres = df_p.groupby(['Líder', 'Nome', 'Data_Ref'], observed=True)[['Célula', 'Culto']].sum().gt(0).astype('int8')
+        self.datas = sorted(df_p['Data_Ref'].unique())
+        self.planos = {m: pres[m].unstack('Data_Ref', fill_value=0).reindex(columns=self.datas, fill_value=0).astype('int8')
+                       for m in ['Célula', 'Culto']}
+
+    def ultimas(self, n):
+        return self.datas[-n:] if n > 0 else []
+
+    def presentes(self, n, modo='Célula'):
+        # (Líder, Nome) com alguma presença nas últimas n reuniões; quem não aparece aqui faltou a todas
+        p = self.planos[modo][self.ultimas(n)]
+        return set(p.index[p.sum(axis=1) > 0])
+
+    def sequencia_ausencias(self, modo='Célula'):
+        # Quantas reuniões seguidas (até a mais recente) cada pessoa faltou
+        p = self.planos[modo].iloc[:, ::-1]
+        return (p.cumsum(axis=1) == 0).sum(axis=1)
+
+    def taxa(self, modo='Célula', datas=None):
+        p = self.planos[modo] if datas is None else self.planos[modo].reindex(columns=datas, fill_value=0)
+        return p.mean(axis=1) if p.shape[1] else pd.Series(0.0, index=p.index)
+
+    def registro(self, lider, data):
+        # {Nome: (Célula, Culto)} lançado por `lider` em `data` ({} se não houver)
+        try: c, u = (self.planos[m].loc[lider, data] for m in ['Célula', 'Culto'])
+        except KeyError: return {}
+        return {n: (bool(c[n]), bool(u[n])) for n in c.index}
+
+    def marcas(self, idx, datas):
+        # Tabela "✅ | ❌" (Célula | Culto) para as (Líder, Nome) de `idx` nas datas pedidas
+        marca = lambda modo: self.planos[modo].reindex(index=idx, columns=datas, fill_value=0).astype(object).replace({1: "✅", 0: "❌"})
+        return marca('Célula') + " | " + marca('Culto')
+
+    def chamada(self, lider, nomes, datas):
+        # Chamada das pessoas de uma célula
+        idx = pd.MultiIndex.from_product([[lider], nomes], names=['Líder', 'Nome'])
+        return self.marcas(idx, datas).set_axis(nomes, axis=0)
+
+
+# --- DADOS DOS PAINÉIS ---
+
+def montar_dados(df_p, df_v, membros):
+    # Tudo que os painéis recebem em `dados`: cubo, contagem de cadastrados e matriz de presença
+    return {"membros": membros, "cubo": montar_cubo(df_p, df_v), "cont_membros": contar_membros(membros),
+            "matriz": MatrizPresenca(df_p)}
@@ -0,0 +1,216 @@
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import uuid
+import pandas as pd
+from esquema import para_planilha, chave_data
+
+# --- ARMAZENAMENTO DAS PLANILHAS ---
+# Interface única para ler/gravar as abas (Presencas, Visitantes, Membros).
+# A implementação padrão fala com o Google Sheets; a local (SQLite) serve
+# para testar o app sem a planilha.
+
+COLUNAS = {
+    "Presencas": ['Data', 'Líder', 'Nome', 'Tipo', 'Célula', 'Culto'],
+    "Visitantes": ['Data', 'Líder', 'Vis_Celula', 'Vis_Culto'],
+    "Membros": ['Líder', 'Nome', 'Tipo'],
+}
+ABA_VERSOES = "Versoes"  # aba de controle: uma revisão por aba, trocada a cada gravação
+
+
+def colunas(worksheet):
+    # 'Presencas_2025' (histórico arquivado) tem as mesmas colunas de 'Presencas'
+    return COLUNAS.get(worksheet.split("_")[0], [])
+
+
+class ConflitoVersao(Exception):
+    """A aba mudou (outra sessão gravou) desde a revisão em que a edição começou."""
+
+    def __init__(self, worksheet, esperada, atual):
+        super().__init__(f"'{worksheet}' foi alterada por outra sessão (revisão {esperada} -> {atual})")
+        self.worksheet, self.esperada, self.atual = worksheet, esperada, atual
+
+
+def _data_chave(valor):
+    # Normaliza '07/03/2026', '2026-03-07' etc. para comparar datas vindas da planilha
+    d = pd.to_datetime(valor, dayfirst=True, errors='coerce')
+    return None if pd.isna(d) else d.strftime('%Y-%m-%d')
+
+
+class Armazenamento(ABC):
+    """Contrato comum: leitura completa, gravação completa e upsert de um bloco (Data, Líder).
+
+    `versoes()` devolve {aba: revisão} para checar mudanças sem baixar as abas;
+    um dicionário vazio significa "não sei" (quem usa deve reler tudo).
+    """
+
+    @abstractmethod
+    def ler(self, worksheet): ...
+
+    @abstractmethod
+    def gravar(self, worksheet, df): ...
+
+    @abstractmethod
+    def upsert_bloco(self, worksheet, df_bloco, data, lider):
+        """Substitui apenas as linhas de `worksheet` com Data == data e Líder == lider."""
+
+    def versoes(self):
+        return {}
+
+    def gravar_se_versao(self, worksheet, df, versao):
+        """Grava a aba inteira só se a revisão ainda for `versao` (trava otimista).
+
+        Na planilha a checagem e a gravação são duas chamadas: sobra uma janela de
+        poucos segundos, mas a edição concorrente normal passa a ser detectada.
+        """
+        atual = self.versoes().get(worksheet)
+        if atual != versao: raise ConflitoVersao(worksheet, versao, atual)
+        self.gravar(worksheet, df)
+
+
+class ArmazenamentoSheets(Armazenamento):
+    def __init__(self, conn, url):
+        self.conn = conn
+        self.url = url
+        self._planilha = None
+
+    def ler(self, worksheet):
+        # ttl=0: quem decide quando reler é o snapshot, não o cache interno da conexão
+        return self.conn.read(spreadsheet=self.url, worksheet=worksheet, ttl=0)
+
+    def gravar(self, worksheet, df):
+        df = para_planilha(df)
+        pl = self._planilha_gs()
+        if pl is not None and worksheet not in [w.title for w in pl.worksheets()]:
+            pl.add_worksheet(worksheet, rows=max(len(df) + 1, 10), cols=max(len(df.columns), 1))
+        self.conn.update(spreadsheet=self.url, worksheet=worksheet, data=df)
+        self._marcar(worksheet)
+
+    def _planilha_gs(self):
+        # Só o cliente de Service Account expõe o gspread (o público é somente leitura)
+        if self._planilha is None:
+            abrir = getattr(self.conn.client, "_open_spreadsheet", None)
+            self._planilha = abrir(spreadsheet=self.url) if abrir else False
+        return self._planilha or None
+
+    def _aba(self, worksheet):
+        pl = self._planilha_gs()
+        return pl.worksheet(worksheet) if pl else None
+
+    def _marcar(self, worksheet):
+        pl = self._planilha_gs()
+        if pl is None: return
+        from gspread.exceptions import WorksheetNotFound
+        try: ws = pl.worksheet(ABA_VERSOES)
+        except WorksheetNotFound:
+            ws = pl.add_worksheet(ABA_VERSOES, rows=10, cols=2)
+            ws.append_row(["Aba", "Revisao"])
+        abas = ws.col_values(1)
+        rev = uuid.uuid4().hex[:12]
+        if worksheet in abas: ws.update_cell(abas.index(worksheet) + 1, 2, rev)
+        else: ws.append_row([worksheet, rev])
+
+    def versoes(self):
+        pl = self._planilha_gs()
+        if pl is None: return {}
+        from gspread.exceptions import WorksheetNotFound
+        # '_planilha' (modifiedTime do Drive) pega edições feitas à mão, que não trocam a revisão
+        v = {"_planilha": pl.get_lastUpdateTime()}
+        try: v.update({l[0]: l[1] for l in pl.worksheet(ABA_VERSOES).get_all_values()[1:] if len(l) >= 2})
+        except WorksheetNotFound: pass
+        return v
+
+    def upsert_bloco(self, worksheet, df_bloco, data, lider):
+        ws = self._aba(worksheet)
+        if ws is None:
+            # Sem acesso à aba: cai na regravação completa
+            atual = para_planilha(self.ler(worksheet))
+            chave = chave_data(atual['Data']).eq(chave_data(pd.Series([data]))[0]) & atual['Líder'].eq(lider)
+            return self.gravar(worksheet, pd.concat([atual[~chave], df_bloco]))
+
+        # USER_ENTERED como a gravação completa (set_with_dataframe): 'dd/mm/aaaa' vira data na planilha
+        from gspread.utils import rowcol_to_a1
+        cab = ws.row_values(1) or colunas(worksheet)
+        i_data, i_lider = cab.index('Data') + 1, cab.index('Líder') + 1
+        c_data, c_lider = (rowcol_to_a1(1, i)[:-1] for i in (i_data, i_lider))
+        col_d, col_l = ws.batch_get([f"{c_data}2:{c_data}", f"{c_lider}2:{c_lider}"])
+        alvo = _data_chave(data)
+        linhas = [i + 2 for i, (d, l) in enumerate(zip(col_d, col_l))
+                  if d and l and l[0] == lider and _data_chave(d[0]) == alvo]
+
+        bloco = para_planilha(df_bloco).reindex(columns=cab)
+        valores = bloco.astype(object).where(bloco.notna(), "").values.tolist()
+
+        if linhas and len(linhas) == len(valores) and linhas[-1] - linhas[0] == len(linhas) - 1:
+            # Mesmo tamanho e contíguo: sobrescreve no lugar
+            ws.update(values=valores, range_name=f"{rowcol_to_a1(linhas[0], 1)}:{rowcol_to_a1(linhas[-1], len(cab))}",
+                      value_input_option="USER_ENTERED")
+            return self._marcar(worksheet)
+        # Apaga as linhas antigas de baixo para cima (em faixas contíguas) e acrescenta o bloco novo
+        faixas = []
+        for r in linhas:
+            if faixas and r == faixas[-1][1] + 1: faixas[-1][1] = r
+            else: faixas.append([r, r])
+        for ini, fim in reversed(faixas): ws.delete_rows(ini, fim)
+        if valores: ws.append_rows(valores, value_input_option="USER_ENTERED")
+        self._marcar(worksheet)
+
+
+class ArmazenamentoLocal(Armazenamento):
+    """Substituto local em SQLite: uma tabela por aba, tudo como texto (igual à planilha)."""
+
+    def __init__(self, caminho=":memory:"):
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._lock = threading.RLock()
+
+    def _garantir(self, worksheet, colunas):
+        cols = ", ".join(f'"{c}"' for c in colunas)
+        self._db.execute(f'CREATE TABLE IF NOT EXISTS "{worksheet}" ({cols})')
+
+    def _marcar(self, worksheet):
+        self._db.execute('CREATE TABLE IF NOT EXISTS _versoes (aba TEXT PRIMARY KEY, rev INTEGER)')
+        self._db.execute('INSERT INTO _versoes VALUES (?, 1) ON CONFLICT(aba) DO UPDATE SET rev = rev + 1', (worksheet,))
+
+    def versoes(self):
+        with self._lock:
+            try: return {a: str(r) for a, r in self._db.execute('SELECT aba, rev FROM _versoes')}
+            except sqlite3.OperationalError: return {}
+
+    def ler(self, worksheet):
+        with self._lock:
+            try: return pd.read_sql_query(f'SELECT * FROM "{worksheet}"', self._db)
+            except (sqlite3.OperationalError, pd.errors.DatabaseError): return pd.DataFrame(columns=colunas(worksheet))
+
+    def _inserir(self, worksheet, df, cols):
+        if df.empty: return
+        marc = ", ".join("?" for _ in cols)
+        nomes = ", ".join(f'"{c}"' for c in cols)
+        self._db.executemany(f'INSERT INTO "{worksheet}" ({nomes}) VALUES ({marc})',
+                             df[cols].astype(object).where(df[cols].notna(), None).values.tolist())
+
+    def gravar(self, worksheet, df):
+        df = para_planilha(df)
+        cols = list(df.columns) or colunas(worksheet)
+        with self._lock, self._db:
+            self._db.execute(f'DROP TABLE IF EXISTS "{worksheet}"')
+            self._garantir(worksheet, cols)
+            self._inserir(worksheet, df, cols)
+            self._marcar(worksheet)
+
+    def gravar_se_versao(self, worksheet, df, versao):
+        # Checagem e gravação sob o mesmo lock: atômico dentro do processo
+        with self._lock:
+            super().gravar_se_versao(worksheet, df, versao)
+
+    def upsert_bloco(self, worksheet, df_bloco, data, lider):
+        bloco = para_planilha(df_bloco)
+        cols = list(bloco.columns) or colunas(worksheet)
+        with self._lock, self._db:
+            self._garantir(worksheet, cols)
+            # Mesma regra da planilha: datas comparadas já normalizadas ('7/3/2026' == '07/03/2026')
+            linhas = self._db.execute(f'SELECT rowid, "Data" FROM "{worksheet}" WHERE "Líder" = ?', (lider,)).fetchall()
+            if linhas:
+                iguais = chave_data(pd.Series([d for _, d in linhas])).eq(chave_data(pd.Series([data]))[0])
+                self._db.executemany(f'DELETE FROM "{worksheet}" WHERE rowid = ?', [(r,) for (r, _), i in zip(linhas, iguais) if i])
+            self._inserir(worksheet, bloco, cols)
+            self._marcar(worksheet)
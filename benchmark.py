@@ -0,0 +1,260 @@
+import argparse
+import csv
+import io
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+from armazenamento import ArmazenamentoSheets, ArmazenamentoLocal
+from dados import normalizar_presencas, normalizar_visitantes, normalizar_membros, dict_membros
+from snapshot import SnapshotLocal
+from agregados import montar_dados
+import paineis
+
+# --- BENCHMARK ---
+# Mede cada etapa do app numa rede sintética, sem tocar na planilha de verdade:
+#   python benchmark.py --celulas 50 --membros 20 --semanas 52
+# A conexão falsa conta chamadas e bytes de cada leitura/gravação, como a cota da API enxergaria.
+
+URL_FALSA = "https://docs.google.com/spreadsheets/d/benchmark"
+
+# --- REDE SINTÉTICA ---
+
+def gerar_rede(celulas=50, membros=20, semanas=52, inicio=date(2026, 1, 3), semente=0):
+    """{aba: DataFrame} no formato da planilha (Data dd/mm/aaaa, tudo como viria do Sheets).
+
+    Cada pessoa tem uma assiduidade própria (uns vêm sempre, outros quase nunca), o culto
+    tem um pouco menos gente que a célula e ~3% dos sábados de cada célula ficam sem lançamento.
+    """
+    rng = np.random.default_rng(semente)
+    lideres = [f"Líder {i:03d}" for i in range(celulas)]
+    m = pd.DataFrame({"Líder": np.repeat(lideres, membros),
+                      "Nome": [f"Pessoa {i:03d}-{j:02d}" for i in range(celulas) for j in range(membros)],
+                      "Tipo": rng.choice(["Membro", "FA"], size=celulas * membros, p=[0.7, 0.3])})
+    # Quem lança: o líder ("Liderança") e as pessoas da célula
+    pessoas = pd.concat([pd.DataFrame({"Líder": lideres, "Nome": lideres, "Tipo": "Liderança"}), m], ignore_index=True)
+    assid = rng.beta(4, 2, size=len(pessoas))
+    datas = [(inicio + timedelta(weeks=k)).strftime('%d/%m/%Y') for k in range(semanas)]
+    lancou = rng.random((semanas, celulas)) > 0.03
+    sem, cel = np.nonzero(lancou)
+
+    # Uma linha por (sábado lançado, pessoa da célula)
+    idx_cel = pessoas['Líder'].map({l: i for i, l in enumerate(lideres)}).to_numpy()
+    por_cel = [np.flatnonzero(idx_cel == c) for c in range(celulas)]
+    linhas = np.concatenate([por_cel[c] for c in cel])
+    sem_l = np.repeat(sem, [len(por_cel[c]) for c in cel])
+    p = pessoas.iloc[linhas].reset_index(drop=True)
+    p.insert(0, "Data", np.array(datas)[sem_l])
+    p["Célula"] = (rng.random(len(p)) < assid[linhas]).astype(int)
+    p["Culto"] = (rng.random(len(p)) < assid[linhas] * 0.85).astype(int)
+
+    v = pd.DataFrame({"Data": np.array(datas)[sem], "Líder": np.array(lideres)[cel],
+                      "Vis_Celula": rng.poisson(1.2, len(sem)), "Vis_Culto": rng.poisson(0.8, len(sem))})
+    return {"Presencas": p, "Visitantes": v, "Membros": m}
+
+
+# --- CONEXÃO FALSA ---
+# As abas ficam em memória como a planilha guarda: listas de linhas de texto, cabeçalho na 1ª.
+# O GSheetsConnection (read/update) e o gspread (planilha/aba) enxergam o mesmo conteúdo,
+# então o salvar mede o caminho de verdade (só as linhas do bloco + a aba de revisões).
+
+def _csv(linhas):
+    buf = io.StringIO(); csv.writer(buf).writerows(linhas)
+    return buf.getvalue()
+
+def _aparar(valores, vazio):
+    # O Sheets não devolve as células/linhas vazias do fim
+    while valores and valores[-1] == vazio: valores.pop()
+    return valores
+
+
+class AbaFalsa:
+    def __init__(self, conn, title):
+        self.conn, self.title = conn, title
+
+    @property
+    def linhas(self):
+        return self.conn.abas[self.title]
+
+    def _celula(self, r, c):
+        return self.linhas[r - 1][c - 1] if r <= len(self.linhas) and c <= len(self.linhas[r - 1]) else ""
+
+    def _por(self, r, c, v):
+        while len(self.linhas) < r: self.linhas.append([])
+        linha = self.linhas[r - 1]
+        linha.extend([""] * (c - len(linha)))
+        linha[c - 1] = "" if v is None else str(v)
+
+    def get_all_values(self):
+        return self.conn._contar("read", [list(l) for l in self.linhas])
+
+    def row_values(self, r):
+        return self.conn._contar("read", [_aparar(list(self.linhas[r - 1]) if r <= len(self.linhas) else [], "")])[0]
+
+    def col_values(self, c):
+        return self.conn._contar("read", [_aparar([self._celula(r, c) for r in range(1, len(self.linhas) + 1)], "")])[0]
+
+    def batch_get(self, ranges):
+        # Só faixas de uma coluna até o fim ('B2:B'): cada linha vira [valor] ou []
+        res = []
+        for faixa in ranges:
+            r0, c = a1_to_rowcol(faixa.split(":")[0])
+            res.append(_aparar([[v] if (v := self._celula(r, c)) else [] for r in range(r0, len(self.linhas) + 1)], []))
+        self.conn._contar("read", [v for col in res for v in col])
+        return res
+
+    def update(self, values=None, range_name=None, **kw):
+        r0, c0 = a1_to_rowcol(range_name.split(":")[0])
+        for i, linha in enumerate(values):
+            for j, v in enumerate(linha): self._por(r0 + i, c0 + j, v)
+        self.conn._contar("update", values, escrita=True)
+
+    def update_cell(self, r, c, v):
+        self._por(r, c, v)
+        self.conn._contar("update", [[v]], escrita=True)
+
+    def delete_rows(self, ini, fim=None):
+        del self.linhas[ini - 1:(fim or ini)]
+        self.conn._contar("update", [], escrita=True)
+
+    def append_rows(self, values, value_input_option=None, **kw):
+        self.linhas.extend([["" if v is None else str(v) for v in l] for l in values])
+        self.conn._contar("update", values, escrita=True)
+
+    def append_row(self, values, **kw):
+        self.append_rows([values], **kw)
+
+
+class PlanilhaFalsa:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def worksheets(self):
+        return [AbaFalsa(self.conn, a) for a in self.conn.abas]
+
+    def worksheet(self, title):
+        if title not in self.conn.abas: raise WorksheetNotFound(title)
+        return AbaFalsa(self.conn, title)
+
+    def add_worksheet(self, title, rows=None, cols=None):
+        self.conn.abas[title] = []
+        return AbaFalsa(self.conn, title)
+
+    def get_lastUpdateTime(self):
+        return str(self.conn.edicoes)
+
+
+class ConexaoFalsa:
+    """Faz o papel do GSheetsConnection (read/update) e do gspread da Service Account,
+    contando chamadas e bytes de cada operação como a cota da API enxergaria."""
+
+    def __init__(self, abas):
+        self.abas = {}
+        self.edicoes = 0
+        for a, df in abas.items(): self._guardar(a, df)
+        self.client = SimpleNamespace(_open_spreadsheet=lambda spreadsheet=None: PlanilhaFalsa(self))
+        self.zerar()
+
+    def zerar(self):
+        self.chamadas = {"read": 0, "update": 0}
+        self.bytes = {"read": 0, "update": 0}
+
+    def _contar(self, op, linhas, escrita=False):
+        # Tamanho em CSV: próximo do que trafega nos valores da API
+        self.chamadas[op] += 1
+        self.bytes[op] += len(_csv(linhas).encode("utf-8"))
+        self.edicoes += escrita
+        return linhas
+
+    def _guardar(self, worksheet, df):
+        self.abas[worksheet] = [list(map(str, df.columns))] + df.astype(object).where(df.notna(), "").astype(str).values.tolist()
+
+    def read(self, spreadsheet=None, worksheet=None, ttl=None, **kw):
+        texto = _csv(self._contar("read", self.abas[worksheet]))
+        return pd.read_csv(io.StringIO(texto)) if texto.strip() else pd.DataFrame()
+
+    def update(self, spreadsheet=None, worksheet=None, data=None, **kw):
+        self._guardar(worksheet, data)
+        self._contar("update", self.abas[worksheet], escrita=True)
+        return data
+
+
+# --- ETAPAS ---
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter(); funcao(); tempos.append(time.perf_counter() - t0)
+    return tempos
+
+def medir(rede, repeticoes=5, ano=None, mes=None):
+    """Roda cada etapa `repeticoes` vezes; devolve uma linha por etapa (tempos em ms, chamadas e bytes da conexão)."""
+    conn = ConexaoFalsa(rede)
+    arm = ArmazenamentoSheets(conn, URL_FALSA)
+    normalizadores = {"Presencas": normalizar_presencas, "Visitantes": normalizar_visitantes, "Membros": normalizar_membros}
+    brutos = {a: arm.ler(a) for a in normalizadores}
+    t = {a: f(brutos[a]) for a, f in normalizadores.items()}
+    membros = dict_membros(t["Membros"])
+    dados = montar_dados(t["Presencas"], t["Visitantes"], membros)
+    ultima = dados["matriz"].datas[-1]
+    ano, mes = ano or ultima.year, mes or ultima.month
+    semanas = paineis.semanas(dados, ano, mes)
+    lids = sorted(membros)
+    pasta = tempfile.TemporaryDirectory()
+
+    # Bloco salvo: a primeira célula no último sábado, como o formulário de lançamento monta
+    d_s = ultima.strftime('%d/%m/%Y')
+    bloco_p = brutos["Presencas"][(brutos["Presencas"]['Data'] == d_s) & (brutos["Presencas"]['Líder'] == lids[0])]
+    bloco_v = brutos["Visitantes"][(brutos["Visitantes"]['Data'] == d_s) & (brutos["Visitantes"]['Líder'] == lids[0])]
+    local = ArmazenamentoLocal()
+    for a, df in brutos.items(): local.gravar(a, df)
+
+    etapas = {
+        "leitura (3 abas)": lambda: [arm.ler(a) for a in normalizadores],
+        "normalização": lambda: [f(brutos[a]) for a, f in normalizadores.items()],
+        "snapshot a frio": lambda: SnapshotLocal(arm, f"{pasta.name}/{time.perf_counter_ns()}", normalizadores).tabelas(),
+        "agregados (cubo + matriz)": lambda: montar_dados(t["Presencas"], t["Visitantes"], membros),
+        "alertas": lambda: paineis.alertas(dados, lids, 2),
+        "cards (get_card_val)": lambda: [paineis.cards(dados, lids, ano, mes, s) for s in semanas],
+        "gráfico evolução": lambda: [paineis.figura_evolucao(dados, lids, ano, mes, m) for m in ['Célula', 'Culto']],
+        "gráfico performance": lambda: paineis.figura_performance(dados, lids, ano, mes),
+        "OB totais semanais": lambda: paineis.totais_semanais(dados, ano, mes),
+        "OB chamada (todas as células)": lambda: [paineis.chamada(dados, c, ano, mes) for c in lids],
+        "OB exportação (uma passada)": lambda: paineis.relatorio_ob(dados, ano, [mes]),
+        "salvar (planilha)": lambda: (arm.upsert_bloco("Presencas", bloco_p, d_s, lids[0]),
+                                     arm.upsert_bloco("Visitantes", bloco_v, d_s, lids[0])),
+        "salvar (SQLite local)": lambda: (local.upsert_bloco("Presencas", bloco_p, d_s, lids[0]),
+                                         local.upsert_bloco("Visitantes", bloco_v, d_s, lids[0])),
+    }
+    res = []
+    for nome, funcao in etapas.items():
+        conn.zerar()
+        tempos = cronometrar(funcao, repeticoes)
+        res.append({"Etapa": nome, "Mediana (ms)": statistics.median(tempos) * 1000, "Mín (ms)": min(tempos) * 1000,
+                    "Reads": conn.chamadas["read"] / repeticoes, "Updates": conn.chamadas["update"] / repeticoes,
+                    "KB lidos": conn.bytes["read"] / repeticoes / 1024, "KB gravados": conn.bytes["update"] / repeticoes / 1024})
+    pasta.cleanup()
+    return pd.DataFrame(res).set_index("Etapa")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark das etapas do app numa rede sintética")
+    ap.add_argument("--celulas", type=int, default=50)
+    ap.add_argument("--membros", type=int, default=20, help="pessoas por célula, fora o líder")
+    ap.add_argument("--semanas", type=int, default=52)
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--semente", type=int, default=0)
+    ap.add_argument("--csv", help="grava o resultado neste arquivo (para comparar entre versões)")
+    a = ap.parse_args()
+    rede = gerar_rede(a.celulas, a.membros, a.semanas, semente=a.semente)
+    print(f"Rede: {a.celulas} células x {a.membros} pessoas x {a.semanas} semanas "
+          f"({len(rede['Presencas'])} linhas de presença, {len(rede['Visitantes'])} de visitantes)")
+    res = medir(rede, a.repeticoes)
+    with pd.option_context("display.float_format", "{:.1f}".format, "display.width", 200, "display.max_columns", None):
+        print(res)
+    if a.csv: res.to_csv(a.csv)
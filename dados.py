@@ -0,0 +1,32 @@
+import pandas as pd
+from armazenamento import COLUNAS
+from esquema import tipar, PRESENCAS, VISITANTES
+
+# --- NORMALIZAÇÃO DAS ABAS ---
+# Transforma o que vem da planilha nas tabelas usadas pelo app (uma função por aba).
+
+def _texto(df, cols):
+    for col in cols: df[col] = df[col].astype(str)
+    return df
+
+def normalizar_presencas(df_p):
+    if df_p is None or df_p.empty: df_p = pd.DataFrame(columns=COLUNAS["Presencas"])
+    return tipar(_texto(df_p.reindex(columns=COLUNAS["Presencas"]), ['Data', 'Líder', 'Nome', 'Tipo']), **PRESENCAS)
+
+def normalizar_visitantes(df_v):
+    if df_v is None or df_v.empty: df_v = pd.DataFrame(columns=COLUNAS["Visitantes"])
+    return tipar(_texto(df_v.reindex(columns=COLUNAS["Visitantes"]), ['Data', 'Líder']), **VISITANTES)
+
+def normalizar_membros(df_m):
+    if df_m is None or df_m.empty: return pd.DataFrame(columns=COLUNAS["Membros"])
+    df_m = df_m.reindex(columns=COLUNAS["Membros"]).dropna(subset=['Líder'])
+    df_m['Tipo'] = df_m['Tipo'].fillna('Membro')
+    return _texto(df_m, COLUNAS["Membros"])
+
+def dict_membros(df_m):
+    # {Líder: {Nome: Tipo}}; 'LIDER_INICIAL' só marca célula sem ninguém cadastrado
+    m_dict = {}
+    for l, n, t in df_m[COLUNAS["Membros"]].itertuples(index=False):
+        if l and l not in m_dict: m_dict[l] = {}
+        if l and n != "LIDER_INICIAL": m_dict[l][n] = t
+    return m_dict
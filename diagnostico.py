@@ -0,0 +1,158 @@
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+from armazenamento import Armazenamento
+
+# --- DIAGNÓSTICO DE DESEMPENHO ---
+# Cada rerun abre uma Execucao (tempo por etapa, linhas, chamadas/bytes ao armazenamento e
+# acertos de cache). A execução corrente fica num ContextVar: o snapshot e o armazenamento,
+# que são compartilhados entre sessões, registram na execução da thread que os chamou.
+# O que roda fora de um rerun (fila de escrita) entra só nos totais do processo.
+
+_atual = contextvars.ContextVar("execucao", default=None)
+
+def _tamanho(obj, amostra=200):
+    # Bytes aproximados da aba em CSV (o que trafega na API), estimados por amostra para sair barato
+    if isinstance(obj, dict): return len(json.dumps(obj))
+    if obj is None or obj.empty: return 0
+    parte = obj.head(amostra)
+    return len(parte.to_csv(index=False).encode("utf-8")) * len(obj) // len(parte)
+
+def _somar(io, op, aba, nbytes, ms, erro):
+    d = io.setdefault((op, aba), {"chamadas": 0, "erros": 0, "bytes": 0, "ms": 0.0})
+    d["chamadas"] += 1; d["erros"] += erro; d["bytes"] += nbytes; d["ms"] += ms
+
+def _tabela_io(io):
+    return pd.DataFrame([{"Operação": o, "Aba": a, "Chamadas": d["chamadas"], "Erros": d["erros"], "KB": round(d["bytes"] / 1024, 1),
+                          "ms": round(d["ms"], 1)} for (o, a), d in io.items()])
+
+
+class Execucao:
+    def __init__(self, sessao):
+        self.sessao, self.inicio = sessao, time.time()
+        self._t0 = time.perf_counter()
+        self.duracao = 0.0
+        self.etapas = {}  # nome -> {"ms", "vezes", "linhas"}
+        self.io = {}      # (operação, aba) -> {"chamadas", "erros", "bytes", "ms"}
+        self.cache = {}   # (nome, origem) -> vezes; origem "memória" = acerto de cache
+        self.concluida = False
+
+    def _marcar_fim(self):
+        self.duracao = (time.perf_counter() - self._t0) * 1000
+
+    @contextmanager
+    def etapa(self, nome, linhas=None):
+        """Cronometra o bloco; `linhas` (ou info["linhas"] dentro do bloco) = linhas processadas."""
+        info = {"linhas": linhas}
+        t0 = time.perf_counter()
+        try: yield info
+        finally:
+            e = self.etapas.setdefault(nome, {"ms": 0.0, "vezes": 0, "linhas": 0})
+            e["ms"] += (time.perf_counter() - t0) * 1000; e["vezes"] += 1; e["linhas"] += info["linhas"] or 0
+            self._marcar_fim()
+
+    def somar_io(self, op, aba, nbytes, ms, erro=False):
+        _somar(self.io, op, aba, nbytes, ms, erro)
+
+    def somar_cache(self, nome, origem):
+        self.cache[(nome, origem)] = self.cache.get((nome, origem), 0) + 1
+
+    def tabelas(self):
+        # (etapas, io, cache) como DataFrames para o painel
+        etapas = pd.DataFrame([{"Etapa": n, "ms": round(e["ms"], 1), "Vezes": e["vezes"], "Linhas": e["linhas"]} for n, e in self.etapas.items()])
+        io = _tabela_io(self.io)
+        cache = pd.DataFrame([{"Nome": n, "Origem": o, "Vezes": v} for (n, o), v in self.cache.items()])
+        return etapas, io, cache
+
+    def registro(self):
+        # Uma linha do log estruturado (JSON)
+        return {"inicio": self.inicio, "sessao": self.sessao, "duracao_ms": round(self.duracao, 1),
+                "etapas": {n: {**e, "ms": round(e["ms"], 1)} for n, e in self.etapas.items()},
+                "io": [{"op": o, "aba": a, **{**d, "ms": round(d["ms"], 1)}} for (o, a), d in self.io.items()],
+                "cache": [{"nome": n, "origem": o, "vezes": v} for (n, o), v in self.cache.items()]}
+
+
+class Diagnostico:
+    """Um por processo: guarda as últimas `limite` execuções e os totais de I/O (inclusive da fila)."""
+
+    def __init__(self, limite=500, arquivo_log=None):
+        self.execucoes = deque(maxlen=limite)
+        self.arquivo_log = arquivo_log  # JSONL, uma linha por rerun (opcional)
+        self.io_total = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, sessao, anterior=None):
+        # Rerun interrompido (st.rerun/st.stop) não chega ao concluir(): fecha aqui com o último tempo medido
+        if anterior is not None and not anterior.concluida: self.concluir(anterior, medir=False)
+        ex = Execucao(sessao)
+        _atual.set(ex)
+        return ex
+
+    def concluir(self, ex, medir=True):
+        if ex.concluida: return
+        if medir: ex._marcar_fim()
+        ex.concluida = True
+        with self._lock:
+            self.execucoes.append(ex)
+            if self.arquivo_log:
+                try:
+                    with open(self.arquivo_log, "a", encoding="utf-8") as f: f.write(json.dumps(ex.registro(), ensure_ascii=False) + "\n")
+                except OSError: pass
+
+    def somar_io(self, op, aba, nbytes, ms, erro=False):
+        with self._lock: _somar(self.io_total, op, aba, nbytes, ms, erro)
+        ex = _atual.get()
+        if ex: ex.somar_io(op, aba, nbytes, ms, erro)
+
+    def somar_cache(self, nome, origem):
+        ex = _atual.get()
+        if ex: ex.somar_cache(nome, origem)
+
+    def resumo(self):
+        # Latência dos reruns concluídos (p50/p95/máx) e totais de I/O do processo
+        with self._lock:
+            dur = pd.Series([e.duracao for e in self.execucoes], dtype=float)
+            io = _tabela_io(self.io_total)
+        lat = {"Reruns": len(dur), "p50 (ms)": dur.quantile(0.5), "p95 (ms)": dur.quantile(0.95), "Máx (ms)": dur.max()} if len(dur) else {}
+        return lat, io
+
+    def exportar(self):
+        # Todas as execuções guardadas em JSONL (para o botão de download)
+        with self._lock:
+            return "".join(json.dumps(e.registro(), ensure_ascii=False) + "\n" for e in self.execucoes)
+
+
+class ArmazenamentoMedido(Armazenamento):
+    """Envolve um Armazenamento contando chamadas, bytes e tempo de cada operação."""
+
+    def __init__(self, base, diagnostico):
+        self.base, self.diagnostico = base, diagnostico
+
+    def _medir(self, op, aba, funcao, df=None):
+        # Chamada que falha (cota, rede, conflito de versão) também conta, com o tempo gasto até o erro
+        t0, res, erro = time.perf_counter(), None, True
+        try:
+            res = funcao(); erro = False
+            return res
+        finally:
+            nbytes = 0 if erro else _tamanho(res if op in ("ler", "versoes") else df)
+            self.diagnostico.somar_io(op, aba, nbytes, (time.perf_counter() - t0) * 1000, erro)
+
+    def ler(self, worksheet):
+        return self._medir("ler", worksheet, lambda: self.base.ler(worksheet))
+
+    def gravar(self, worksheet, df):
+        return self._medir("gravar", worksheet, lambda: self.base.gravar(worksheet, df), df)
+
+    def upsert_bloco(self, worksheet, df_bloco, data, lider):
+        return self._medir("upsert_bloco", worksheet, lambda: self.base.upsert_bloco(worksheet, df_bloco, data, lider), df_bloco)
+
+    def versoes(self):
+        return self._medir("versoes", "*", self.base.versoes)
+
+    def gravar_se_versao(self, worksheet, df, versao):
+        return self._medir("gravar_se_versao", worksheet, lambda: self.base.gravar_se_versao(worksheet, df, versao), df)
@@ -0,0 +1,77 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# --- FILA DE ESCRITA EM SEGUNDO PLANO ---
+# Uma thread por processo grava na planilha o que as sessões enfileiram. Pedidos para a
+# mesma (aba, chave) ainda não iniciados são fundidos (vale o último) e falhas passageiras
+# (cota/instabilidade da API) são repetidas com espera exponencial.
+
+STATUS_FINAIS = ("gravado", "substituído", "erro")
+
+def _transitorio(e):
+    cod = getattr(getattr(e, "response", None), "status_code", None)
+    # OSError cobre ConnectionError/TimeoutError e as exceções de rede do requests
+    return isinstance(e, OSError) or cod in (429, 500, 502, 503, 504)
+
+
+class Pedido:
+    def __init__(self, id, aba, chave, funcao, descricao):
+        self.id, self.aba, self.chave = id, aba, chave
+        self.funcao, self.descricao = funcao, descricao
+        self.status, self.tentativas, self.erro = "na fila", 0, None
+
+    @property
+    def concluido(self):
+        return self.status in STATUS_FINAIS
+
+
+class FilaEscrita:
+    def __init__(self, ao_concluir=None, tentativas=5, espera=1.0):
+        self.ao_concluir = ao_concluir  # chamado com o Pedido depois de gravar (ou desistir)
+        self.tentativas, self.espera = tentativas, espera
+        self._fila = OrderedDict()  # (aba, chave) -> Pedido, na ordem de chegada
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        threading.Thread(target=self._trabalhar, name="fila-escrita", daemon=True).start()
+
+    def enviar(self, aba, chave, funcao, descricao=""):
+        """Enfileira `funcao()` e devolve o Pedido para a sessão acompanhar o status."""
+        with self._cond:
+            p = Pedido(next(self._ids), aba, chave, funcao, descricao)
+            anterior = self._fila.get((aba, chave))
+            if anterior: anterior.status = "substituído"  # mantém a posição na fila, grava o mais novo
+            self._fila[(aba, chave)] = p
+            self._cond.notify()
+            return p
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._fila)
+
+    def _trabalhar(self):
+        while True:
+            with self._cond:
+                while not self._fila: self._cond.wait()
+                _, p = self._fila.popitem(last=False)
+                p.status = "gravando"
+            self._executar(p)
+
+    def _executar(self, p):
+        final = "erro"
+        for t in range(1, self.tentativas + 1):
+            p.tentativas = t
+            try:
+                p.funcao(); final, p.erro = "gravado", None
+                break
+            except Exception as e:
+                p.erro = str(e)
+                if not _transitorio(e) or t == self.tentativas: break
+                time.sleep(self.espera * 2 ** (t - 1))
+        # ao_concluir (invalidar o snapshot) antes de publicar o status: quem espera o pedido
+        # concluir para reler os dados já encontra o snapshot invalidado
+        if self.ao_concluir:
+            try: self.ao_concluir(p)
+            except Exception: pass
+        p.status = final
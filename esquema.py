@@ -0,0 +1,33 @@
+import pandas as pd
+
+# --- ESQUEMA DAS TABELAS EM MEMÓRIA ---
+# Dentro do app: Líder/Nome/Tipo categóricos, data como datetime64 (Data_Ref) com
+# Ano/MesNum/Semana já calculados e presenças em int8. O formato da planilha
+# ('Data' dd/mm/aaaa, tudo texto) só aparece na leitura (tipar) e na gravação (para_planilha).
+
+COLS_DATA = ['Data_Ref', 'Ano', 'MesNum', 'Semana']
+PRESENCAS = {"categorias": ['Líder', 'Nome', 'Tipo'], "inteiros": {'Célula': 'int8', 'Culto': 'int8'}}
+VISITANTES = {"categorias": ['Líder'], "inteiros": {'Vis_Celula': 'int16', 'Vis_Culto': 'int16'}}
+
+def chave_data(serie):
+    # Texto da planilha -> datetime64 (meia-noite); inválidos viram NaT
+    return pd.to_datetime(serie, dayfirst=True, errors='coerce').dt.normalize()
+
+def tipar(df, categorias, inteiros):
+    df = df.assign(Data_Ref=chave_data(df['Data'])).drop(columns=['Data']).dropna(subset=['Data_Ref'])
+    df['Ano'] = df['Data_Ref'].dt.year.astype('int16')
+    df['MesNum'] = df['Data_Ref'].dt.month.astype('int8')
+    df['Semana'] = df['Data_Ref'].dt.isocalendar().week.astype('int8')
+    for col in categorias: df[col] = df[col].astype('category')
+    for col, tipo in inteiros.items(): df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(tipo)
+    return df[COLS_DATA + categorias + list(inteiros)].reset_index(drop=True)
+
+def para_planilha(df):
+    """Volta ao formato da planilha: 'Data' dd/mm/aaaa, sem colunas derivadas, categorias como texto."""
+    if 'Data' not in df.columns and 'Data_Ref' in df.columns:
+        df = df.assign(Data=df['Data_Ref'].dt.strftime('%d/%m/%Y'))
+    df = df.drop(columns=[c for c in COLS_DATA + ['Data_Obj'] if c in df.columns])
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype): df[col] = df[col].astype(str)
+    if 'Data' in df.columns: df['Data'] = df['Data'].astype(str)
+    return df
@@ -0,0 +1,82 @@
+import importlib.util
+import io
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+import pandas as pd
+
+# --- EXPORTAÇÃO DO RELATÓRIO OB ---
+# O arquivo (XLSX ou ZIP de CSVs) é montado numa thread; a sessão só acompanha o progresso.
+# Tarefas ficam guardadas pela chave (versão dos dados, ano, meses, formato): pedir de novo
+# o mesmo relatório devolve o arquivo pronto na hora.
+
+def formatos():
+    # XLSX só com openpyxl instalado; o ZIP de CSVs funciona sempre
+    return (["XLSX"] if importlib.util.find_spec("openpyxl") else []) + ["CSV (zip)"]
+
+def _nome_aba(nome, usados):
+    # Nome de aba válido no Excel: sem []:*?/\, até 31 caracteres e sem repetir
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(nome))[:31] or "Célula"
+    nome, i = base, 1
+    while nome.lower() in usados: i += 1; nome = f"{base[:31 - len(str(i)) - 1]}~{i}"
+    usados.add(nome.lower())
+    return nome
+
+def gerar_arquivo(totais, chamada, formato, avisar=lambda frac, texto: None):
+    """Bytes do relatório: totais da rede + chamada de cada célula (coluna 'Célula' de `chamada`)."""
+    buf = io.BytesIO()
+    celulas = list(dict.fromkeys(chamada['Célula']))
+    if formato == "XLSX":
+        usados = {"totais semanais"}
+        with pd.ExcelWriter(buf, engine="openpyxl") as w:
+            totais.to_excel(w, sheet_name="Totais Semanais", index=False)
+            for i, (cel, df) in enumerate(chamada.groupby('Célula', sort=False)):
+                df.drop(columns='Célula').to_excel(w, sheet_name=_nome_aba(cel, usados), index=False)
+                avisar((i + 1) / max(len(celulas), 1), f"Célula {cel}")
+    else:
+        # utf-8-sig: o Excel abre os CSVs com acento certo
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("totais_semanais.csv", totais.to_csv(index=False).encode("utf-8-sig"))
+            avisar(0.5, "Chamada")
+            z.writestr("chamada.csv", chamada.to_csv(index=False).encode("utf-8-sig"))
+    avisar(1.0, "Pronto")
+    return buf.getvalue()
+
+
+class Tarefa:
+    def __init__(self, funcao):
+        self.status, self.progresso, self.texto = "na fila", 0.0, ""
+        self.resultado, self.erro = None, None
+        threading.Thread(target=self._rodar, args=(funcao,), name="exportacao", daemon=True).start()
+
+    @property
+    def concluida(self):
+        return self.status in ("pronto", "erro")
+
+    def avisar(self, frac, texto):
+        self.progresso, self.texto = min(max(frac, 0.0), 1.0), texto
+
+    def _rodar(self, funcao):
+        self.status = "gerando"
+        try: self.resultado = funcao(self.avisar); self.status = "pronto"
+        except Exception as e: self.erro, self.status = str(e), "erro"
+
+
+class Exportador:
+    """Uma por processo: guarda as últimas `limite` tarefas pela chave do relatório."""
+
+    def __init__(self, limite=8):
+        self.limite = limite
+        self._tarefas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pedir(self, chave, funcao):
+        # Devolve a tarefa já existente (pronta ou em andamento) ou dispara `funcao(avisar)` numa thread
+        with self._lock:
+            t = self._tarefas.get(chave)
+            if t is None or t.status == "erro":
+                t = self._tarefas[chave] = Tarefa(funcao)
+                while len(self._tarefas) > self.limite: self._tarefas.popitem(last=False)
+            self._tarefas.move_to_end(chave)
+            return t
@@ -0,0 +1,66 @@
+import copy
+import pandas as pd
+
+# --- EDIÇÃO DE MEMBROS EM LOTE ---
+# As ações da aba Gestão mexem só numa cópia local; "Confirmar" grava a aba Membros
+# uma única vez, e só se ninguém a alterou desde a revisão em que a edição começou.
+
+class EdicaoMembros:
+    def __init__(self, membros, versao):
+        self.base = copy.deepcopy(membros)
+        self.atual = copy.deepcopy(membros)
+        self.versao = versao
+        self.operacoes = []
+
+    def _op(self, descricao):
+        self.operacoes.append(descricao)
+
+    def criar_celula(self, lider):
+        if not lider or lider in self.atual: return False
+        self.atual[lider] = {}; self._op(f"Criar célula de {lider}")
+        return True
+
+    def adicionar(self, celula, nome, tipo):
+        if not nome: return False
+        self.atual[celula][nome] = tipo; self._op(f"Adicionar {nome} ({tipo}) em {celula}")
+        return True
+
+    def promover(self, origem, nome):
+        del self.atual[origem][nome]
+        self.atual[nome] = {}; self._op(f"Tornar {nome} líder (sai de {origem})")
+
+    def transferir(self, origem, destino, nome):
+        self.atual[destino][nome] = self.atual[origem].pop(nome); self._op(f"Transferir {nome}: {origem} → {destino}")
+
+    def alternar_tipo(self, celula, nome):
+        novo = "FA" if self.atual[celula][nome] == "Membro" else "Membro"
+        self.atual[celula][nome] = novo; self._op(f"{nome} ({celula}) passa a {novo}")
+
+    def excluir_pessoa(self, celula, nome):
+        del self.atual[celula][nome]; self._op(f"Excluir {nome} de {celula}")
+
+    def excluir_celula(self, celula):
+        del self.atual[celula]; self._op(f"Excluir célula de {celula}")
+
+    def diferencas(self):
+        """Tabela Antes/Depois por pessoa (só o que de fato mudou)."""
+        def achatar(m):
+            d = {(l, "(célula)"): "Liderança" for l in m}
+            d.update({(l, n): t for l, ps in m.items() for n, t in ps.items()})
+            return d
+        a, b = achatar(self.base), achatar(self.atual)
+        linhas = [{"Célula": l, "Nome": n, "Antes": a.get((l, n), "—"), "Depois": b.get((l, n), "—")}
+                  for l, n in sorted(a.keys() | b.keys()) if a.get((l, n)) != b.get((l, n))]
+        return pd.DataFrame(linhas, columns=["Célula", "Nome", "Antes", "Depois"])
+
+    def para_tabela(self):
+        # Formato da aba Membros; célula sem ninguém vira uma linha 'LIDER_INICIAL'
+        lista = []
+        for ld, ps in self.atual.items():
+            if not ps: lista.append({"Líder": ld, "Nome": "LIDER_INICIAL", "Tipo": "Liderança"})
+            else: lista.extend({"Líder": ld, "Nome": n, "Tipo": t} for n, t in ps.items())
+        return pd.DataFrame(lista, columns=["Líder", "Nome", "Tipo"])
+
+    def confirmar(self, armazenamento):
+        """Grava tudo de uma vez; levanta ConflitoVersao se a aba mudou no meio do caminho."""
+        armazenamento.gravar_se_versao("Membros", self.para_tabela(), self.versao)
@@ -0,0 +1,59 @@
+import re
+import pandas as pd
+from esquema import chave_data
+
+# --- HISTÓRICO POR ANO ---
+# Anos fechados saem das abas vivas ('Presencas', 'Visitantes') para abas próprias
+# ('Presencas_2025', ...). As abas vivas ficam do tamanho de um ano e os anos antigos
+# só são lidos quando alguém escolhe aquele ano.
+
+ABAS_HISTORICO = ["Presencas", "Visitantes"]
+
+def aba_ano(aba, ano):
+    return f"{aba}_{ano}"
+
+def anos_arquivados(abas):
+    # Anos arquivados = com as duas abas de histórico (Presencas_<ano> e Visitantes_<ano>);
+    # se só uma existe, o arquivamento parou no meio e o ano ainda vale pelas abas vivas
+    por_aba = [{int(m.group(1)) for a in abas if (m := re.fullmatch(rf"{base}_(\d{{4}})", a))} for base in ABAS_HISTORICO]
+    return sorted(set.intersection(*por_aba))
+
+def aba_destino(aba, ano, arquivados):
+    # Onde gravar um lançamento de `ano`: na aba do ano, se ele já foi arquivado
+    return aba_ano(aba, ano) if ano in arquivados else aba
+
+def abas_janela(anos, arquivados):
+    # Abas necessárias para montar os anos pedidos: as vivas sempre, as de histórico só se existirem
+    return ABAS_HISTORICO + [aba_ano(a, ano) for ano in anos if ano in arquivados for a in ABAS_HISTORICO]
+
+def juntar_janela(tabelas, aba, anos, arquivados):
+    """Linhas de `aba` nos anos pedidos. Ano arquivado vem só da aba do ano
+    (linhas que ainda estejam na aba viva são ignoradas: arquivar duas vezes não duplica)."""
+    vivo = tabelas[aba]
+    partes = [vivo[vivo['Ano'].isin([a for a in anos if a not in arquivados])]]
+    partes += [tabelas[aba_ano(aba, a)] for a in anos if a in arquivados]
+    df = pd.concat(partes, ignore_index=True)
+    # concat de categorias diferentes vira texto: volta para categoria
+    for col in ['Líder', 'Nome', 'Tipo']:
+        if col in df.columns: df[col] = df[col].astype('category')
+    return df
+
+def arquivar_ano(armazenamento, ano, arquivados):
+    """Move as linhas de `ano` das abas vivas para as abas do ano.
+
+    As duas abas de histórico são gravadas sempre, mesmo vazias (o ano só conta como
+    arquivado com as duas), e só depois as abas vivas são enxugadas; se cair no meio,
+    a leitura já ignora as linhas que sobraram na aba viva. Ano já arquivado recebe as
+    sobras da aba viva no lugar dos blocos (Data, Líder) iguais que já estejam no histórico.
+    """
+    brutos = {aba: armazenamento.ler(aba) for aba in ABAS_HISTORICO}
+    do_ano = {aba: chave_data(df['Data']).dt.year == ano for aba, df in brutos.items()}
+    for aba, df in brutos.items():
+        destino, sobra = aba_ano(aba, ano), df[do_ano[aba]]
+        if ano not in arquivados: armazenamento.gravar(destino, sobra)
+        elif not sobra.empty:
+            hist = armazenamento.ler(destino)
+            blocos = lambda d: pd.MultiIndex.from_arrays([chave_data(d['Data']), d['Líder'].astype(str)])
+            armazenamento.gravar(destino, pd.concat([hist[~blocos(hist).isin(blocos(sobra))], sobra], ignore_index=True))
+    for aba, df in brutos.items():
+        if do_ano[aba].any(): armazenamento.gravar(aba, df[~do_ano[aba]])
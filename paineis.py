@@ -0,0 +1,105 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from agregados import filtrar, por_semana
+
+# --- CONSTRUTORES DO DASHBOARD E DO OB ---
+# Funções puras: recebem `dados` (cubo, cont_membros, matriz, membros) e os filtros da tela
+# e devolvem textos, tabelas ou figuras. O app memoiza pelo par (versão dos dados, filtros).
+
+MESES_NOMES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+MESES_MAP = {n: i+1 for i, n in enumerate(MESES_NOMES)}
+
+def alertas(dados, lids_f, n_al):
+    matriz = dados["matriz"]
+    if len(matriz.datas) < n_al: return None
+    ult = matriz.ultimas(n_al)
+    vis_ult = filtrar(dados["cubo"], datas=ult).groupby('Líder', observed=True)['Vis_Celula'].sum()
+    presentes = matriz.presentes(n_al)
+    msgs = []
+    for lid in lids_f:
+        if vis_ult.get(lid, 0) == 0: msgs.append(f"🚩 **{lid}**: Sem visitantes nas últimas {n_al} semanas.")
+        for n, t in dados["membros"].get(lid, {}).items():
+            if (lid, n) not in presentes: msgs.append(f"👤 **{n}** ({lid}): Ausente nas últimas {n_al} reuniões.")
+    return msgs
+
+def semanas(dados, ano, mes):
+    # Sábados do mês com chamada lançada
+    return list(por_semana(filtrar(dados["cubo"], ano=ano, mes=mes)).index)
+
+def cards(dados, lids_f, ano, mes, semana):
+    tot_s = filtrar(dados["cubo"], lideres=lids_f, ano=ano, mes=mes, data=semana).sum(numeric_only=True)
+    cont_f = dados["cont_membros"].reindex(lids_f, fill_value=0).sum()
+    def get_card_val(tipo, modo):
+        if tipo == "M": return f"{int(tot_s[f'M_{modo}'])}/{int(cont_f['Membro']) + len(lids_f)}"
+        elif tipo == "FA": return f"{int(tot_s[f'FA_{modo}'])}/{int(cont_f['FA'])}"
+        else: return str(int(tot_s['Vis_Celula' if modo == 'Célula' else 'Vis_Culto']))
+    return [(rot, get_card_val(tipo, modo)) for rot, tipo, modo in [
+        ("Mem. Célula", "M", "Célula"), ("FA Célula", "FA", "Célula"), ("Vis. Célula", "V", "Célula"),
+        ("Mem. Culto", "M", "Culto"), ("FA Culto", "FA", "Culto"), ("Vis. Culto", "V", "Culto")]]
+
+def figura_evolucao(dados, lids_f, ano, mes, modo):
+    g = filtrar(dados["cubo"], lideres=lids_f, ano=ano, mes=mes).groupby('Data_Ref', observed=True)[[f'M_{modo}', f'FA_{modo}', f'Outro_{modo}', 'Vis_Celula' if modo=='Célula' else 'Vis_Culto']].sum()
+    mrg = pd.DataFrame({modo: g.iloc[:, :3].sum(axis=1), 'Vis': g.iloc[:, 3]}).reset_index().sort_values('Data_Ref')
+    mrg['D'] = mrg['Data_Ref'].dt.strftime('%d/%m')
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=mrg['D'], y=mrg[modo], name='Membros+FA', mode='lines+markers+text', text=mrg[modo], textposition="top center"))
+    fig.add_trace(go.Scatter(x=mrg['D'], y=mrg.iloc[:,2], name='Visitantes', mode='lines+markers+text', text=mrg.iloc[:,2], textposition="bottom center"))
+    fig.update_layout(height=300, margin=dict(l=0,r=0,t=30,b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return fig
+
+def figura_performance(dados, lids_f, ano, mes):
+    # Mês pedido e os dois anteriores, voltando para o ano anterior se preciso (Dezembro/2025)
+    dados_comp = []
+    for a, idx in [divmod(ano * 12 + mes - 1 - k, 12) for k in (2, 1, 0)]:
+        idx += 1
+        if a in dados["cubo"]['Ano'].values or a == ano:
+            nome_m = MESES_NOMES[idx-1] if a == ano else f"{MESES_NOMES[idx-1]}/{a}"
+            t_mes = filtrar(dados["cubo"], lideres=lids_f, ano=a, mes=idx).sum(numeric_only=True)
+            val_fa = int(t_mes['FA_Célula'])
+            val_mem = int(t_mes['M_Célula'])
+            val_vis = int(t_mes['Vis_Celula'])
+            dados_comp.append({"Mês": nome_m, "Métrica": "Membro + FA", "Valor": val_mem + val_fa})
+            dados_comp.append({"Mês": nome_m, "Métrica": "Visitante", "Valor": val_vis})
+            dados_comp.append({"Mês": nome_m, "Métrica": "Total Geral", "Valor": val_mem + val_fa + val_vis})
+    if not dados_comp: return None
+    df_barras = pd.DataFrame(dados_comp)
+    fig_bar = px.bar(df_barras, x="Mês", y="Valor", color="Métrica", barmode="group", text_auto=True,
+                     color_discrete_map={"Membro + FA": "#38BDF8", "Visitante": "#0284C7", "Total Geral": "#F8FAFC"}, height=400)
+    fig_bar.update_layout(plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font_color="#F8FAFC",
+                         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5))
+    return fig_bar
+
+def _totais(sem):
+    # "Célula/Culto" por semana, a partir das somas de por_semana()
+    par = lambda ce, cu: ce.astype(str) + "/" + cu.astype(str)
+    return pd.DataFrame({"Data": sem.index.strftime('%d/%m'), "Membros": par(sem['M_Célula'], sem['M_Culto']),
+                         "FA": par(sem['FA_Célula'], sem['FA_Culto']), "Vis": par(sem['Vis_Celula'], sem['Vis_Culto']),
+                         "Total": par(sem['M_Célula'] + sem['FA_Célula'] + sem['Vis_Celula'], sem['M_Culto'] + sem['FA_Culto'] + sem['Vis_Culto'])}).reset_index(drop=True)
+
+def totais_semanais(dados, ano, mes):
+    return _totais(por_semana(filtrar(dados["cubo"], ano=ano, mes=mes)))
+
+def chamada(dados, cel, ano, mes):
+    m_cel = [(cel, "Liderança")] + list(dados["membros"].get(cel, {}).items())
+    d_mes = semanas(dados, ano, mes)
+    cham_d = dados["matriz"].chamada(cel, [n for n, _ in m_cel], d_mes).reset_index(drop=True)
+    cham_d.columns = [d.strftime('%d/%m') for d in d_mes]
+    cham_d.insert(0, "Pessoa", [f"{n} ({t})" for n, t in m_cel])
+    return cham_d
+
+def relatorio_ob(dados, ano, meses):
+    """Relatório OB da rede inteira nos meses pedidos: (totais semanais, chamada de todas as células).
+
+    Uma passada só: as semanas saem do cubo e a chamada de todo mundo de uma reindexação da
+    matriz; a chamada vem em formato longo, com a coluna 'Célula'.
+    """
+    cubo = filtrar(dados["cubo"], ano=ano)
+    sem = por_semana(cubo[cubo['MesNum'].isin(meses)])
+    pessoas = [(cel, n, t) for cel in sorted(dados["membros"]) for n, t in [(cel, "Liderança")] + list(dados["membros"][cel].items())]
+    idx = pd.MultiIndex.from_arrays([[c for c, _, _ in pessoas], [n for _, n, _ in pessoas]], names=['Líder', 'Nome'])
+    cham = dados["matriz"].marcas(idx, list(sem.index)).reset_index(drop=True)
+    cham.columns = [d.strftime('%d/%m') for d in sem.index]
+    cham.insert(0, "Pessoa", [f"{n} ({t})" for _, n, t in pessoas])
+    cham.insert(0, "Célula", [c for c, _, _ in pessoas])
+    return _totais(sem), cham
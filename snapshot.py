@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import pandas as pd
+
+# --- SNAPSHOT LOCAL VERSIONADO ---
+# Cópia local (Parquet) das abas já normalizadas, compartilhada por todas as sessões
+# do servidor. A cada `intervalo` segundos pergunta ao armazenamento só as revisões
+# (`versoes()`) e rebaixa/renormaliza apenas as abas que mudaram.
+# Abas de histórico ('Presencas_2025', ...) usam o normalizador da aba base e só
+# entram na memória quando alguém pede por elas.
+
+class SnapshotLocal:
+    def __init__(self, armazenamento, pasta, normalizadores, intervalo=30):
+        self.armazenamento = armazenamento
+        self.pasta = Path(pasta)
+        self.normalizadores = normalizadores  # {aba base: função(df_bruto) -> df_normalizado}
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._tabelas, self._derivados = {}, {}
+        self._meta, self._remotas = {}, {}  # revisão por aba no snapshot / última resposta de versoes()
+        self._verif = {}  # aba -> instante da última checagem
+        self.versao = 0  # muda sempre que alguma aba é recarregada
+        self.ao_consultar = None  # função(nome, origem) chamada a cada aba/derivado entregue (diagnóstico)
+        self._ler_meta()
+
+    def _normalizador(self, aba):
+        return self.normalizadores[aba.split("_")[0]]
+
+    def _ler_meta(self):
+        try:
+            meta = json.loads((self.pasta / "meta.json").read_text(encoding="utf-8"))
+            self._meta, self._remotas = meta["abas"], meta["remotas"]
+        except Exception:
+            # Sem snapshot (ou em formato antigo): começa do zero
+            self._meta, self._remotas = {}, {}
+
+    def _do_disco(self, aba):
+        arq = self.pasta / f"{aba}.parquet"
+        if aba not in self._meta or not arq.exists(): return
+        try: self._tabelas[aba] = pd.read_parquet(arq)
+        except Exception: self._meta.pop(aba, None)
+
+    def _gravar_disco(self, abas):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        for aba in abas:
+            tmp = self.pasta / f"{aba}.parquet.tmp"
+            self._tabelas[aba].to_parquet(tmp, index=False)
+            os.replace(tmp, self.pasta / f"{aba}.parquet")
+        tmp = self.pasta / "meta.json.tmp"
+        tmp.write_text(json.dumps({"abas": self._meta, "remotas": self._remotas}), encoding="utf-8")
+        os.replace(tmp, self.pasta / "meta.json")
+
+    def _sincronizar(self, abas):
+        # Devolve {aba: origem}: "planilha" (baixada agora), "disco" (Parquet) ou "verificada" (já estava na memória)
+        origem = {}
+        for aba in abas:
+            if aba not in self._tabelas: self._do_disco(aba); origem[aba] = "disco"
+        v = self.armazenamento.versoes()
+        if v:
+            # Nenhuma revisão mudou mas a planilha sim: edição manual, tudo que está no snapshot fica suspeito
+            revs = lambda d: {k: r for k, r in d.items() if not k.startswith("_")}
+            if self._remotas and revs(v) == revs(self._remotas) and v.get("_planilha") != self._remotas.get("_planilha"):
+                self._meta = {a: "?" for a in self._meta}
+            mudou = [a for a in abas if a not in self._tabelas or a not in self._meta or v.get(a) != self._meta[a]]
+        else: mudou = list(abas)
+        for aba in mudou:
+            self._tabelas[aba] = self._normalizador(aba)(self.armazenamento.ler(aba))
+        if mudou: self._derivados, self.versao = {}, self.versao + 1
+        if v: self._remotas = v
+        for aba in abas: self._meta[aba] = v.get(aba)
+        self._gravar_disco(mudou)
+        return {a: "planilha" if a in mudou else origem.get(a, "verificada") for a in abas}
+
+    def tabelas(self, abas=None, forcar=False, revisoes=False):
+        """{aba: DataFrame normalizado} das abas pedidas (padrão: as abas base).
+
+        Com `revisoes=True` devolve também {aba: revisão}, lidas sob o mesmo lock que os
+        DataFrames (par consistente para edição com trava otimista).
+        Os DataFrames são compartilhados entre sessões: não alterar no lugar.
+        """
+        abas = list(abas or self.normalizadores)
+        with self._lock:
+            agora = time.monotonic()
+            # Revisão "?" (edição manual detectada) vence na hora: nunca é entregue como revisão
+            vencidas = [a for a in abas if forcar or a not in self._verif or agora - self._verif[a] >= self.intervalo
+                        or self._meta.get(a) == "?"]
+            origem = dict.fromkeys(abas, "memória")
+            if vencidas:
+                origem.update(self._sincronizar(vencidas))
+                self._verif.update({a: agora for a in vencidas})
+            if self.ao_consultar:
+                for a, o in origem.items(): self.ao_consultar(a, o)
+            t = {a: self._tabelas[a] for a in abas}
+            return (t, {a: self._meta.get(a) for a in abas}) if revisoes else t
+
+    def abas_remotas(self):
+        # Abas que o armazenamento conhece (pela última checagem de revisões)
+        with self._lock:
+            return [k for k in self._remotas if not k.startswith("_")]
+
+    def derivado(self, nome, funcao):
+        """funcao(tabelas) calculada uma vez por versão dos dados e compartilhada entre sessões."""
+        with self._lock:
+            calculou = nome not in self._derivados
+            if calculou: self._derivados[nome] = funcao(dict(self._tabelas))
+            if self.ao_consultar: self.ao_consultar(nome, "calculado" if calculou else "memória")
+            return self._derivados[nome]
+
+    def invalidar(self, *abas):
+        # Força a releitura das abas indicadas (ou de todas) na próxima chamada de `tabelas()`
+        with self._lock:
+            for aba in abas or list(self._meta): self._meta.pop(aba, None); self._verif.pop(aba, None)
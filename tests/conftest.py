@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do app ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,168 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from armazenamento import ArmazenamentoLocal, ArmazenamentoSheets, ConflitoVersao
+from benchmark import ConexaoFalsa, URL_FALSA
+from dados import normalizar_presencas
+from escrita import FilaEscrita
+from historico import anos_arquivados, juntar_janela, arquivar_ano, aba_ano
+
+# --- CAMINHO DE GRAVAÇÃO SEM O GOOGLE SHEETS ---
+# A planilha é a ConexaoFalsa do benchmark (GSheetsConnection + gspread em memória);
+# o SQLite local roda em ':memory:'.
+
+def presencas(data, lider, nomes, celula=1):
+    return pd.DataFrame([{"Data": data, "Líder": lider, "Nome": n, "Tipo": "Membro", "Célula": celula, "Culto": 0} for n in nomes])
+
+def visitantes(data, lider, n=1):
+    return pd.DataFrame([{"Data": data, "Líder": lider, "Vis_Celula": n, "Vis_Culto": 0}])
+
+BASE = pd.concat([presencas("07/03/2026", "Ana", ["A1", "A2"]), presencas("07/03/2026", "Bia", ["B1", "B2"]),
+                  presencas("14/03/2026", "Ana", ["A1", "A2"])], ignore_index=True)
+
+def planilha(abas):
+    conn = ConexaoFalsa({})
+    arm = ArmazenamentoSheets(conn, URL_FALSA)
+    for a, df in abas.items(): arm.gravar(a, df)
+    return arm, conn
+
+def local(abas):
+    arm = ArmazenamentoLocal()
+    for a, df in abas.items(): arm.gravar(a, df)
+    return arm, None
+
+@pytest.fixture(params=[planilha, local], ids=["planilha", "local"])
+def arm(request):
+    return request.param({"Presencas": BASE, "Visitantes": visitantes("07/03/2026", "Ana")})[0]
+
+def bloco(df, data, lider):
+    return df[(df['Data'] == data) & (df['Líder'] == lider)]
+
+def esperar(pedidos, limite=5):
+    fim = time.monotonic() + limite
+    while not all(p.concluido for p in pedidos):
+        assert time.monotonic() < fim, "fila não concluiu"
+        time.sleep(0.01)
+
+
+# --- UPSERT DE BLOCO ---
+
+def test_upsert_mesmo_tamanho_sobrescreve_no_lugar():
+    arm, _ = planilha({"Presencas": BASE})
+    arm.upsert_bloco("Presencas", presencas("07/03/2026", "Bia", ["B1", "B2"], celula=0), "07/03/2026", "Bia")
+    df = arm.ler("Presencas")
+    assert len(df) == len(BASE)
+    assert df['Nome'].tolist() == BASE['Nome'].tolist()  # mesma posição: nada apagado nem acrescentado
+    assert bloco(df, "07/03/2026", "Bia")['Célula'].tolist() == [0, 0]
+
+def test_upsert_tamanho_diferente_apaga_e_acrescenta(arm):
+    arm.upsert_bloco("Presencas", presencas("07/03/2026", "Ana", ["A1", "A2", "A3"], celula=0), "07/03/2026", "Ana")
+    df = arm.ler("Presencas")
+    assert len(df) == len(BASE) + 1
+    assert bloco(df, "07/03/2026", "Ana")['Nome'].tolist() == ["A1", "A2", "A3"]
+    assert bloco(df, "07/03/2026", "Ana")['Célula'].tolist() == [0, 0, 0]
+    assert len(bloco(df, "07/03/2026", "Bia")) == 2 and len(bloco(df, "14/03/2026", "Ana")) == 2
+
+def test_upsert_compara_datas_normalizadas(arm):
+    arm.upsert_bloco("Presencas", presencas("7/3/2026", "Ana", ["A1"]), "7/3/2026", "Ana")
+    df = arm.ler("Presencas")
+    assert len(bloco(df, "07/03/2026", "Ana")) == 0
+    assert bloco(df, "7/3/2026", "Ana")['Nome'].tolist() == ["A1"]
+    assert len(bloco(df, "07/03/2026", "Bia")) == 2  # mesma data, outro líder: intacto
+
+def test_upsert_lider_sem_linhas(arm):
+    arm.upsert_bloco("Visitantes", visitantes("07/03/2026", "Caio", 3), "07/03/2026", "Caio")
+    df = arm.ler("Visitantes")
+    assert len(df) == 2
+    assert bloco(df, "07/03/2026", "Caio")['Vis_Celula'].tolist() == [3]
+
+def test_upsert_troca_revisao(arm):
+    antes = arm.versoes().get("Presencas")
+    arm.upsert_bloco("Presencas", presencas("14/03/2026", "Ana", ["A1"]), "14/03/2026", "Ana")
+    assert arm.versoes().get("Presencas") not in (None, antes)
+
+
+# --- TRAVA OTIMISTA ---
+
+def test_gravar_se_versao(arm):
+    rev = arm.versoes()["Presencas"]
+    arm.upsert_bloco("Presencas", presencas("21/03/2026", "Bia", ["B1"]), "21/03/2026", "Bia")  # outra sessão
+    with pytest.raises(ConflitoVersao) as e:
+        arm.gravar_se_versao("Presencas", BASE, rev)
+    assert e.value.worksheet == "Presencas" and e.value.esperada == rev
+    arm.gravar_se_versao("Presencas", BASE, arm.versoes()["Presencas"])
+    assert len(arm.ler("Presencas")) == len(BASE)
+
+
+# --- FILA DE ESCRITA ---
+
+def test_fila_funde_pedidos_do_mesmo_bloco():
+    liberar, gravados = threading.Event(), []
+    fila = FilaEscrita(espera=0)
+    trava = fila.enviar("Presencas", "trava", liberar.wait)
+    p1 = fila.enviar("Presencas", ("07/03/2026", "Ana"), lambda: gravados.append(1))
+    p2 = fila.enviar("Presencas", ("07/03/2026", "Ana"), lambda: gravados.append(2))
+    p3 = fila.enviar("Visitantes", ("07/03/2026", "Ana"), lambda: gravados.append(3))
+    liberar.set()
+    esperar([trava, p2, p3])
+    assert p1.status == "substituído" and p2.status == "gravado"
+    assert gravados == [2, 3]
+
+def test_fila_repete_falha_passageira():
+    falhas = iter([ConnectionError("rede"), TimeoutError("lenta")])
+    def funcao():
+        e = next(falhas, None)
+        if e: raise e
+    p = FilaEscrita(espera=0).enviar("Presencas", "x", funcao)
+    esperar([p])
+    assert p.status == "gravado" and p.tentativas == 3 and p.erro is None
+
+def test_fila_desiste_de_erro_definitivo():
+    def funcao(): raise ValueError("coluna faltando")
+    p = FilaEscrita(tentativas=5, espera=0).enviar("Presencas", "x", funcao)
+    esperar([p])
+    assert p.status == "erro" and p.tentativas == 1 and "coluna" in p.erro
+
+def test_fila_conclui_antes_de_publicar_status():
+    vistos = []
+    fila = FilaEscrita(ao_concluir=lambda p: vistos.append(p.status), espera=0)
+    p = fila.enviar("Presencas", "x", lambda: None)
+    esperar([p])
+    assert vistos == ["gravando"]
+
+
+# --- HISTÓRICO POR ANO ---
+
+def test_anos_arquivados_exige_as_duas_abas():
+    abas = ["Presencas", "Presencas_2024", "Presencas_2025", "Visitantes_2025", "Visitantes_2023", "_planilha"]
+    assert anos_arquivados(abas) == [2025]
+
+def test_juntar_janela():
+    viva = normalizar_presencas(pd.concat([presencas("06/12/2025", "Ana", ["velho"]), presencas("03/01/2026", "Ana", ["A1"])]))
+    hist = normalizar_presencas(presencas("06/12/2025", "Bia", ["B1"]))
+    df = juntar_janela({"Presencas": viva, "Presencas_2025": hist}, "Presencas", [2025, 2026], [2025])
+    assert sorted(df['Nome']) == ["A1", "B1"]  # linha de 2025 que sobrou na aba viva é ignorada
+    assert df['Líder'].dtype == "category"
+
+def test_arquivar_ano_move_as_linhas():
+    arm, _ = local({"Presencas": pd.concat([presencas("06/12/2025", "Ana", ["A1"]), presencas("03/01/2026", "Ana", ["A1"])]),
+                    "Visitantes": visitantes("03/01/2026", "Ana")})
+    arquivar_ano(arm, 2025, [])
+    assert anos_arquivados(arm.versoes()) == [2025]
+    assert arm.ler("Presencas")['Data'].tolist() == ["03/01/2026"]
+    assert arm.ler(aba_ano("Presencas", 2025))['Data'].tolist() == ["06/12/2025"]
+    assert arm.ler(aba_ano("Visitantes", 2025)).empty  # criada mesmo sem linhas do ano
+
+def test_rearquivar_leva_sobras_para_o_historico():
+    arm, _ = local({"Presencas": presencas("06/12/2025", "Ana", ["A1"]), "Visitantes": visitantes("06/12/2025", "Ana")})
+    arquivar_ano(arm, 2025, [])
+    # Lançamentos gravados na aba viva depois do arquivamento: um bloco novo e um que corrige o histórico
+    arm.upsert_bloco("Presencas", presencas("13/12/2025", "Ana", ["A1"]), "13/12/2025", "Ana")
+    arm.upsert_bloco("Presencas", presencas("6/12/2025", "Ana", ["A1", "A2"], celula=0), "6/12/2025", "Ana")
+    arquivar_ano(arm, 2025, [2025])
+    assert arm.ler("Presencas").empty
+    hist = arm.ler(aba_ano("Presencas", 2025))
+    assert sorted(hist['Data']) == ["13/12/2025", "6/12/2025", "6/12/2025"]
+    assert hist.loc[hist['Data'] == "6/12/2025", 'Célula'].tolist() == [0, 0]
+    assert len(arm.ler(aba_ano("Visitantes", 2025))) == 1